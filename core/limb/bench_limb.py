@@ -0,0 +1,289 @@
+"""
+TITAN PROTOCOL | LIMB BENCHMARK HARNESS
+=======================================================
+Drives a real TitanLimb against in-process stand-ins:
+  - Mock Dispatcher (websocket): HMAC challenge, paced job stream, result acks
+  - Mock Ollama (HTTP): /api/tags, /api/ps, /api/generate (NDJSON or buffered)
+Reports throughput, p50/p99 latency, time to first chunk, heartbeat jitter and memory.
+
+Usage:
+  python3 core/limb/bench_limb.py --jobs 200 --rate 20 --concurrency 4 --stream
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+import websockets
+
+BENCH_KEY = "titan-bench-key"
+BENCH_MODEL = "llama3:latest"
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _rss_mb():
+    """Current RSS from /proc when available, else peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# --- MOCK OLLAMA ---
+class MockOllama:
+    """Fake Ollama with a fixed prefill latency and a steady decode rate."""
+
+    def __init__(self, latency: float, token_rate: float, tokens: int):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.requests = 0
+        self.runner = None
+
+    def _final(self, body, text=""):
+        eval_duration = int(self.tokens / self.token_rate * 1e9)
+        final = {
+            "model": body.get("model", BENCH_MODEL),
+            "response": text,
+            "done": True,
+            "total_duration": int(self.latency * 1e9) + eval_duration,
+            "load_duration": 0,
+            "prompt_eval_count": max(1, len(body.get("prompt", "")) // 4),
+            "prompt_eval_duration": int(self.latency * 1e9),
+            "eval_count": self.tokens,
+            "eval_duration": eval_duration
+        }
+        if not body.get("raw"):
+            final["context"] = [1, 2, 3]  # like Ollama, raw requests get no context back
+        return final
+
+    async def tags(self, request):
+        return web.json_response({"models": [{"name": BENCH_MODEL}]})
+
+    async def ps(self, request):
+        return web.json_response({"models": [{"name": BENCH_MODEL}]})
+
+    async def generate(self, request):
+        body = await request.json()
+        self.requests += 1
+        if not body.get("prompt") or body.get("options", {}).get("num_predict") == 0:
+            return web.json_response(self._final(body))  # preload
+
+        await asyncio.sleep(self.latency)
+        step = 1.0 / self.token_rate
+        if not body.get("stream", True):
+            await asyncio.sleep(step * self.tokens)
+            return web.json_response(self._final(body, "tok " * self.tokens))
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        for _ in range(self.tokens):
+            await asyncio.sleep(step)
+            await resp.write((json.dumps({"model": body["model"], "response": "tok ", "done": False}) + "\n").encode())
+        await resp.write((json.dumps(self._final(body)) + "\n").encode())
+        await resp.write_eof()
+        return resp
+
+    async def start(self, port: int) -> str:
+        app = web.Application()
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_post("/api/generate", self.generate)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+# --- MOCK DISPATCHER ---
+class MockDispatcher:
+    """Issues the HMAC challenge, paces jobs at `rate`/s and timestamps everything it receives."""
+
+    def __init__(self, jobs: int, rate: float, stream: bool, prompt_chars: int):
+        self.jobs = jobs
+        self.rate = rate
+        self.stream = stream
+        self.prompt = "x" * prompt_chars
+        self.sent_at = {}
+        self.first_chunk_at = {}
+        self.done_at = {}
+        self.heartbeats = []
+        self.deferred = 0
+        self.rejected = 0
+        self.authenticated = False
+        self.finished = asyncio.Event()
+        self.server = None
+
+    async def _handler(self, ws):
+        nonce = os.urandom(8).hex()
+        await ws.send(json.dumps({"challenge": nonce}))
+        expected = hmac.new(BENCH_KEY.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+        reader = asyncio.create_task(self._reader(ws, expected))
+        try:
+            for i in range(self.jobs):
+                job_id = f"bench-{i}"
+                self.sent_at[job_id] = time.perf_counter()
+                await ws.send(json.dumps({"job_id": job_id, "prompt": f"{i} {self.prompt}", "stream": self.stream}))
+                await asyncio.sleep(1.0 / self.rate)
+            await self.finished.wait()
+        finally:
+            reader.cancel()
+
+    async def _reader(self, ws, expected):
+        async for raw in ws:
+            now = time.perf_counter()
+            msg = json.loads(raw) if isinstance(raw, str) else {}
+            if msg.get("challenge_resp"):
+                self.authenticated = msg["challenge_resp"] == expected
+                continue
+            event = msg.get("last_event")
+            job_id = msg.get("job_id")
+            if event == "JOB_CHUNK":
+                self.first_chunk_at.setdefault(job_id, now)
+            elif event == "JOB_COMPLETE":
+                self.done_at.setdefault(job_id, now)
+                await ws.send(json.dumps({"type": "ack", "job_id": job_id}))
+            elif event == "JOB_DEFERRED":
+                self.deferred += 1
+                self.done_at.setdefault(job_id, now)
+            elif event == "JOB_REJECTED":
+                self.rejected += 1
+                self.done_at.setdefault(job_id, now)
+            elif msg.get("type") == "handshake" or "ack" in msg:
+                pass  # registration and job receipts are not heartbeats
+            elif msg.get("type") == "hb" or "slots" in msg:
+                self.heartbeats.append(now)
+            if len(self.done_at) >= self.jobs:
+                self.finished.set()
+
+    async def start(self, port: int) -> str:
+        self.server = await websockets.serve(self._handler, "127.0.0.1", port)
+        port = next(iter(self.server.sockets)).getsockname()[1]
+        return f"ws://127.0.0.1:{port}/connect"
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+# --- BENCHMARK DRIVER ---
+async def run_benchmark(args) -> dict:
+    ollama = MockOllama(args.latency, args.token_rate, args.tokens)
+    dispatcher = MockDispatcher(args.jobs, args.rate, args.stream, args.prompt_chars)
+    ollama_url = await ollama.start(args.ollama_port)
+    uplink = await dispatcher.start(args.dispatcher_port)
+
+    import worker_node
+    node = worker_node.TitanLimb(connect_url=uplink, max_concurrency=args.concurrency,
+                                 backends=[f"ollama={ollama_url}#{args.concurrency}"])
+
+    rss_start = _rss_mb()
+    started = time.perf_counter()
+    node_task = asyncio.create_task(node.run())
+    try:
+        await asyncio.wait_for(dispatcher.finished.wait(), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - started
+    rss_end = _rss_mb()
+
+    node_task.cancel()
+    await asyncio.gather(node_task, return_exceptions=True)
+    await dispatcher.stop()
+    await ollama.stop()
+
+    latencies = [dispatcher.done_at[j] - dispatcher.sent_at[j] for j in dispatcher.done_at if j in dispatcher.sent_at]
+    first_chunk = [dispatcher.first_chunk_at[j] - dispatcher.sent_at[j] for j in dispatcher.first_chunk_at]
+    gaps = [b - a for a, b in zip(dispatcher.heartbeats, dispatcher.heartbeats[1:])]
+    completed = len(dispatcher.done_at) - dispatcher.deferred - dispatcher.rejected
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        "jobs_sent": len(dispatcher.sent_at),
+        "jobs_completed": completed,
+        "jobs_deferred": dispatcher.deferred,
+        "jobs_rejected": dispatcher.rejected,
+        "authenticated": dispatcher.authenticated,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_jobs_s": round(completed / elapsed, 2) if elapsed else 0,
+        "latency_p50_ms": ms(_percentile(latencies, 0.50)),
+        "latency_p99_ms": ms(_percentile(latencies, 0.99)),
+        "first_chunk_p50_ms": ms(_percentile(first_chunk, 0.50)),
+        "first_chunk_p99_ms": ms(_percentile(first_chunk, 0.99)),
+        "heartbeats": len(dispatcher.heartbeats),
+        "heartbeat_gap_p50_ms": ms(_percentile(gaps, 0.50)),
+        "heartbeat_gap_max_ms": ms(max(gaps) if gaps else None),
+        "heartbeat_jitter_ms": ms(statistics.pstdev(gaps) if len(gaps) > 1 else None),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_end, 1),
+        "ollama_requests": ollama.requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Titan Limb offline benchmark")
+    parser.add_argument("--jobs", type=int, default=100, help="Jobs to dispatch")
+    parser.add_argument("--rate", type=float, default=10.0, help="Dispatch rate (jobs/s)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Limb concurrency slots")
+    parser.add_argument("--stream", action="store_true", help="Request streamed results")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per mock completion")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Mock decode rate (tokens/s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock prefill latency (s)")
+    parser.add_argument("--prompt-chars", type=int, default=256, help="Prompt length (chars)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Give up after this many seconds")
+    parser.add_argument("--ollama-port", type=int, default=0, help="Mock Ollama port (0 = ephemeral)")
+    parser.add_argument("--dispatcher-port", type=int, default=0, help="Mock dispatcher port (0 = ephemeral)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep limb INFO logging")
+    args = parser.parse_args()
+
+    # The limb reads its configuration from the environment at import time
+    os.environ.setdefault("SI64_WALLET_ADDRESS", "BENCHMARK_WALLET")
+    os.environ["GENESIS_KEY"] = BENCH_KEY
+    os.environ.setdefault("TITAN_JOURNAL_PATH", os.path.join(tempfile.mkdtemp(prefix="titan-bench-"), "jobs.jsonl"))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import worker_node
+    worker_node.GENESIS_KEY = BENCH_KEY
+    # Importing the limb no longer configures logging
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format=worker_node.TEXT_LOG_FORMAT)
+
+    report = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        width = max(len(k) for k in report)
+        for key, value in report.items():
+            print(f"{key:<{width}}  {value}")
+
+
+if __name__ == "__main__":
+    main()
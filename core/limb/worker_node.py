@@ -11,23 +11,35 @@ Capabilities:
   - Thermal Throttling & Self-Preservation
 """
 
+from __future__ import annotations
+
 import asyncio
-import websockets
+import base64
+import functools
+import glob
 import json
 import logging
+import logging.handlers
+import queue
+import threading
+import atexit
 import hmac
 import hashlib
+import itertools
 import os
 import sys
 import platform
 import argparse
+import random
 import uuid
 import re
 import subprocess
-import aiohttp
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter, OrderedDict, deque
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Optional
 import socket
 
 
@@ -73,9 +85,9 @@ def print_critical_warning():
     sys.exit(1)
 
 try:
-    import docker  # Optional; enables container isolation when available
+    import msgpack  # Optional; enables binary frames when the dispatcher negotiates them
 except ImportError:
-    docker = None
+    msgpack = None
 
 # --- CONFIGURATION LAYER ---
 # Calculate the TitanNetwork root directory
@@ -106,45 +118,1350 @@ SYSTEM = platform.system().lower()
 IS_JETSON = False
 IS_MAC = (SYSTEM == 'darwin' and ARCH == 'arm64')
 
-# Jetson-Specific Libraries
-if IS_JETSON:
+# Probed sensor layout is cached on disk and reused until the machine, kernel or boot changes
+HARDWARE_PROFILE_PATH = os.path.expanduser(os.getenv("TITAN_HARDWARE_PROFILE", "~/TitanNetwork/limb/hardware.json"))
+HARDWARE_PROFILE_VERSION = 2
+# hwmon drivers whose temp*_input is a GPU die temperature
+GPU_HWMON_DRIVERS = ("amdgpu", "radeon", "nouveau")
+
+
+def _discover_linux_sensors(sysfs: str = "/sys"):
+    """
+    Locates GPU temperature sources (sysfs thermal zones of type *gpu*, or GPU driver
+    hwmon sensors) and hwmon power rails. CPU, ACPI and NVMe zones are never read as
+    the GPU temperature: with no GPU source the temperature is reported as 0 (unknown).
+    """
+    temp_paths = []
+    for zone in sorted(glob.glob(os.path.join(sysfs, "class/thermal/thermal_zone*"))):
+        try:
+            with open(os.path.join(zone, "type")) as f:
+                if "gpu" in f.read().strip().lower():
+                    temp_paths.append(os.path.join(zone, "temp"))
+        except OSError:
+            continue
+
+    # (paths, scale to watts) for power*_input (uW), or INA3221 channel 1 volt/curr pair (mV, mA)
+    power_readers = []
+    for hwmon in sorted(glob.glob(os.path.join(sysfs, "class/hwmon/hwmon*"))):
+        try:
+            with open(os.path.join(hwmon, "name")) as f:
+                if f.read().strip() in GPU_HWMON_DRIVERS:
+                    temp_paths.extend(sorted(glob.glob(os.path.join(hwmon, "temp*_input")))[:1])
+        except OSError:
+            pass
+        for path in sorted(glob.glob(os.path.join(hwmon, "power*_input"))):
+            power_readers.append(((path,), 1e-6))
+        volt, curr = os.path.join(hwmon, "in1_input"), os.path.join(hwmon, "curr1_input")
+        if os.path.exists(volt) and os.path.exists(curr):
+            power_readers.append(((volt, curr), 1e-6))
+    return temp_paths, power_readers[:1]
+
+
+def _hardware_fingerprint() -> Dict:
     try:
-        from jtop import jtop
-    except ImportError:
-        pass # Telemetry will degrade gracefully if missing
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()  # hwmon numbering can change across reboots
+    except OSError:
+        boot_id = None
+    return {"version": HARDWARE_PROFILE_VERSION, "node": platform.node(), "system": SYSTEM,
+            "arch": ARCH, "kernel": platform.release(), "boot_id": boot_id}
+
+
+def load_hardware_profile(path: str = HARDWARE_PROFILE_PATH) -> Dict:
+    """Returns the cached hardware profile, probing and rewriting it when stale. Blocking."""
+    fingerprint = _hardware_fingerprint()
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        if profile.get("fingerprint") == fingerprint:
+            return profile
+    except (OSError, ValueError):
+        pass
+
+    profile = {"fingerprint": fingerprint, "is_jetson": IS_JETSON, "is_mac": IS_MAC, "linux_sensors": None}
+    if SYSTEM == 'linux':
+        temp_paths, power_readers = _discover_linux_sensors()
+        profile["linux_sensors"] = {"temps": temp_paths, "power": [[list(paths), scale] for paths, scale in power_readers]}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.getLogger(__name__).debug(f"Hardware profile not cached: {e}")
+    return profile
 
 # --- LOGGING SETUP ---
-log_dir = os.path.expanduser("~/TitanNetwork/limb/logs")
-os.makedirs(log_dir, exist_ok=True)
-
-logging.basicConfig(
-    format="%(asctime)s | %(levelname)s | [%(name)s] | %(message)s", 
-    level=logging.INFO,
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(os.path.join(log_dir, "limb.log"))
-    ]
-)
+# "queue" mode (default) hands records to a background writer thread so slow
+# SD/eMMC storage never stalls the event loop; "sync" is the legacy direct mode.
+LOG_MODE = os.getenv("TITAN_LOG_MODE", "queue").lower()
+LOG_FORMAT = os.getenv("TITAN_LOG_FORMAT", "text").lower()  # text | json
+LOG_ROTATE = os.getenv("TITAN_LOG_ROTATE", "size").lower()  # size | time
+LOG_MAX_BYTES = int(os.getenv("TITAN_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("TITAN_LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUPS = int(os.getenv("TITAN_LOG_BACKUPS", "5"))
+LOG_BATCH_SIZE = int(os.getenv("TITAN_LOG_BATCH_SIZE", "64"))
+LOG_FLUSH_INTERVAL = float(os.getenv("TITAN_LOG_FLUSH_INTERVAL", "1.0"))
+# Keep 1 in N records per child logger, e.g. "HEARTBEAT=30,JANITOR=10"
+LOG_SAMPLE = os.getenv("TITAN_LOG_SAMPLE", "HEARTBEAT=30")
+TEXT_LOG_FORMAT = "%(asctime)s | %(levelname)s | [%(name)s] | %(message)s"
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes 1 in N records for the configured loggers (matched on the last name component)."""
+
+    def __init__(self, spec: str):
+        super().__init__()
+        self.rates = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            name, _, rate = item.partition("=")
+            self.rates[name.strip()] = max(1, int(rate or 1))
+        self._counts = Counter()
+
+    def filter(self, record):
+        rate = self.rates.get(record.name.rsplit(".", 1)[-1])
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        self._counts[record.name] += 1
+        return self._counts[record.name] % rate == 1 % rate
+
+
+class _BatchFlushMixin:
+    """Defers the per-record flush; the log writer flushes once per batch."""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class _BatchStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _BatchRotatingFileHandler(_BatchFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class _BatchTimedRotatingFileHandler(_BatchFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class LogWriter(threading.Thread):
+    """Background log writer: drains the record queue in batches and flushes each handler once per batch."""
+
+    def __init__(self, record_queue, handlers):
+        super().__init__(name="titan-log-writer", daemon=True)
+        self.queue = record_queue
+        self.handlers = handlers
+        self._stop_token = object()
+
+    def run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            batch = [record]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is self._stop_token:
+                    continue
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            for handler in self.handlers:
+                handler.flush_batch()
+            if any(record is self._stop_token for record in batch):
+                return
+
+    def stop(self):
+        self.queue.put(self._stop_token)
+        self.join(timeout=5)
+
+
+def setup_logging(log_dir: str) -> Optional[LogWriter]:
+    """Configures root logging. Returns the background writer in queue mode."""
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, "limb.log")
+    formatter = JsonLineFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_LOG_FORMAT)
+
+    if LOG_MODE != "queue":
+        handlers = [logging.StreamHandler(sys.stdout), logging.FileHandler(log_path)]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            handler.addFilter(SamplingFilter(LOG_SAMPLE))
+        logging.basicConfig(level=logging.INFO, handlers=handlers)
+        return None
+
+    if LOG_ROTATE == "time":
+        file_handler = _BatchTimedRotatingFileHandler(log_path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUPS)
+    else:
+        file_handler = _BatchRotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+    writer_handlers = [_BatchStreamHandler(sys.stdout), file_handler]
+    for handler in writer_handlers:
+        handler.setFormatter(formatter)
+
+    # Sampling runs on the caller's thread so dropped records never reach the queue
+    record_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(record_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))  # final layout is applied by the writer
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+
+    writer = LogWriter(record_queue, writer_handlers)
+    writer.start()
+    atexit.register(writer.stop)
+    return writer
+
+
+# setup_logging() runs from __main__; embedding processes keep their own logging config
+LOG_DIR = os.path.expanduser("~/TitanNetwork/limb/logs")
 LOGGER_NAME = "TITAN_LIMB_ORIN" if IS_JETSON else ("TITAN_LIMB_APPLE" if IS_MAC else "TITAN_LIMB_STD")
 logger = logging.getLogger(LOGGER_NAME)
+heartbeat_logger = logger.getChild("HEARTBEAT")
 NODE_ID = f"{platform.node()}_{LOGGER_NAME.split('_')[-1]}_{str(uuid.uuid4())[:4]}"
 
 # --- CONTAINER EXECUTION MODE ---
 CONTAINER_MODE = os.getenv("TITAN_CONTAINER_MODE", "false").lower() == "true"
-DOCKER_CLIENT = None
 
-if docker is not None:
+
+def _connect_docker():
+    """Imports docker-py and connects to the daemon. Blocking; only called in container mode."""
     try:
-        DOCKER_CLIENT = docker.from_env()
+        import docker  # Optional; enables container isolation when available
+    except ImportError:
+        logger.warning("[SECURITY] Docker library not installed. Running without container isolation.")
+        return None
+    try:
+        client = docker.from_env()
         logger.info("[SECURITY] Docker client initialized - container isolation ENABLED")
+        return client
     except Exception as e:
         logger.warning(f"[SECURITY] Docker unavailable: {e}. Fallback to safe mode.")
-        DOCKER_CLIENT = None
-else:
-    logger.warning("[SECURITY] Docker library not installed. Running without container isolation.")
+        return None
+
+
+# --- NETWORK STACK ---
+# aiohttp and websockets load with the first TitanLimb, not at import, so tools and
+# tests can import this module (and its helper classes) cheaply.
+aiohttp = None
+web = None
+websockets = None
+
+
+def _import_network_stack():
+    global aiohttp, web, websockets
+    if aiohttp is None:
+        import aiohttp as _aiohttp
+        import websockets as _websockets
+        from aiohttp import web as _web
+        aiohttp, web, websockets = _aiohttp, _web, _websockets
+
+# --- SANDBOX POOL ---
+# Idle containers kept running so sandboxed jobs skip container start-up.
+SANDBOX_IMAGE = os.getenv("TITAN_SANDBOX_IMAGE", "python:3.10-slim-bookworm")
+SANDBOX_POOL_SIZE = int(os.getenv("TITAN_SANDBOX_POOL_SIZE", "2"))
+SANDBOX_MAX_USES = max(1, int(os.getenv("TITAN_SANDBOX_MAX_USES", "25")))
+SANDBOX_HEALTH_INTERVAL = float(os.getenv("TITAN_SANDBOX_HEALTH_INTERVAL", "30"))
+SANDBOX_MEM_LIMIT = os.getenv("TITAN_SANDBOX_MEM_LIMIT", "1g")
+
+# --- JOB JOURNAL ---
+# Accepted jobs and finished results are journaled so a dropped uplink (or a
+# restart) does not throw away a finished generation. Dispatcher acks trim it.
+# Only active once the dispatcher negotiates {"type": "protocol", "acks": true}.
+JOURNAL_ENABLED = os.getenv("TITAN_JOURNAL", "true").lower() == "true"
+JOURNAL_PATH = os.path.expanduser(os.getenv("TITAN_JOURNAL_PATH", "~/TitanNetwork/limb/journal/jobs.jsonl"))
+JOURNAL_RETENTION = float(os.getenv("TITAN_JOURNAL_RETENTION", "3600"))
+JOURNAL_COMPACT_BYTES = int(os.getenv("TITAN_JOURNAL_COMPACT_BYTES", str(8 * 1024 * 1024)))
+JOURNAL_FSYNC = os.getenv("TITAN_JOURNAL_FSYNC", "false").lower() == "true"
+
+# --- METRICS ---
+# Local Prometheus endpoint (text exposition format); 0 disables it.
+METRICS_PORT = int(os.getenv("TITAN_METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("TITAN_METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 100, 150, 200)
+
+# --- INFERENCE BACKENDS ---
+# TITAN_BACKENDS lists endpoints as "[kind=]url[#parallel]", comma separated, e.g.
+#   ollama=http://127.0.0.1:11434#2,ollama=http://127.0.0.1:11435#2,openai=http://127.0.0.1:8080#4
+# kind is "ollama" (default) or "openai" (OpenAI-compatible: llama.cpp server, vLLM).
+# Unset, the limb drives the single TITAN_OLLAMA_HOST.
+BACKEND_DEFAULT_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "2"))
+BACKEND_FAILURE_THRESHOLD = int(os.getenv("TITAN_BACKEND_FAILURE_THRESHOLD", "3"))  # consecutive failures that open the circuit
+BACKEND_OPEN_SECONDS = float(os.getenv("TITAN_BACKEND_OPEN_SECONDS", "30"))  # before a half-open trial request
+OPENAI_API_KEY = os.getenv("TITAN_OPENAI_API_KEY")
+
+
+def _parse_backend_specs(raw: str) -> list:
+    """Parses TITAN_BACKENDS into [(kind, url, parallel)]."""
+    specs = []
+    for entry in filter(None, (e.strip() for e in raw.split(","))):
+        kind = "ollama"
+        if re.match(r"^\w+=", entry):
+            kind, entry = entry.split("=", 1)
+        url, _, parallel = entry.partition("#")
+        specs.append((kind.lower(), url.rstrip("/"), int(parallel or BACKEND_DEFAULT_PARALLEL)))
+    return specs
+
+
+BACKEND_SPECS = _parse_backend_specs(os.getenv("TITAN_BACKENDS", "")) or [("ollama", TITAN_OLLAMA_HOST, BACKEND_DEFAULT_PARALLEL)]
+
+# --- JOB SCHEDULER ---
+# Backends serve their `parallel` requests concurrently (OLLAMA_NUM_PARALLEL for a
+# single Ollama); match the total by default so the limb never leaves slots idle.
+MAX_CONCURRENT_JOBS = max(1, int(os.getenv("TITAN_MAX_CONCURRENT_JOBS", str(sum(p for _, _, p in BACKEND_SPECS)))))
+JOB_QUEUE_DEPTH = int(os.getenv("TITAN_JOB_QUEUE_DEPTH", "0"))  # 0 = 4 jobs per slot
+
+# --- OLLAMA CONNECTION POOL ---
+# One long-lived session per limb; idle connections are kept warm between jobs.
+OLLAMA_POOL_SIZE = int(os.getenv("TITAN_OLLAMA_POOL_SIZE", str(MAX_CONCURRENT_JOBS + 4)))  # per backend
+OLLAMA_KEEPALIVE_TIMEOUT = float(os.getenv("TITAN_OLLAMA_KEEPALIVE_TIMEOUT", "60"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("TITAN_OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_PROBE_TIMEOUT = float(os.getenv("TITAN_OLLAMA_PROBE_TIMEOUT", "10"))
+
+# --- STREAMING RELAY ---
+# Jobs may request "stream": true; this flag makes streaming the default.
+# Tokens are coalesced into JOB_CHUNK frames by size or age, whichever hits first.
+STREAM_RESULTS = os.getenv("TITAN_STREAM_RESULTS", "false").lower() == "true"
+STREAM_CHUNK_CHARS = int(os.getenv("TITAN_STREAM_CHUNK_CHARS", "256"))
+STREAM_FLUSH_INTERVAL = float(os.getenv("TITAN_STREAM_FLUSH_INTERVAL", "0.25"))
+# Generation statistics Ollama reports on the final response object
+OLLAMA_STAT_FIELDS = ("total_duration", "load_duration", "prompt_eval_count",
+                      "prompt_eval_duration", "eval_count", "eval_duration")
+
+# --- BULK JOBS (EMBED / BATCH_GENERATE) ---
+# One websocket job carries many inputs; results stream back as JOB_CHUNK frames.
+# Embeddings travel as base64 little-endian float32 rows, not JSON float lists.
+EMBED_MODEL = os.getenv("TITAN_EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = int(os.getenv("TITAN_EMBED_BATCH_SIZE", "64"))
+EMBED_ENCODING = "f32le-b64"
+BATCH_CONCURRENCY = int(os.getenv("TITAN_BATCH_CONCURRENCY", "4"))  # requests in flight per bulk job
+BATCH_CHUNK_ITEMS = int(os.getenv("TITAN_BATCH_CHUNK_ITEMS", "32"))  # batch_generate results per JOB_CHUNK
+BULK_MAX_ITEMS = int(os.getenv("TITAN_BULK_MAX_ITEMS", "10000"))
+
+# --- MODEL ROUTING ---
+# Strategic Model Selection
+# Jetson Orin (64GB) -> Heavyweight Commander (70B)
+# Mac Studio (Unified) -> Agile Architect (32B/70B depends on specific Mac config)
+# Standard GPU -> Fallback (8B)
+HARDWARE_TARGET_MODEL = "llama3.3:70b" if IS_JETSON else ("qwen2.5-coder:32b" if IS_MAC else "llama3")
+TARGET_MODEL = os.getenv("TITAN_MODEL", HARDWARE_TARGET_MODEL)
+MODEL_REFRESH_INTERVAL = float(os.getenv("TITAN_MODEL_REFRESH_INTERVAL", "30"))
+
+# --- WARM KEEPER ---
+# Residency requested from Ollama on every preload/job; refreshed well before it lapses.
+WARM_KEEP_ALIVE = os.getenv("TITAN_KEEP_ALIVE", "30m")
+WARM_REFRESH_INTERVAL = float(os.getenv("TITAN_WARM_REFRESH_INTERVAL", "240"))
+WARM_MAX_MODELS = max(1, int(os.getenv("TITAN_WARM_MAX_MODELS", "1")))
+# Embedding models have their own budget so embed-heavy traffic never evicts the generation model
+WARM_MAX_EMBED_MODELS = max(0, int(os.getenv("TITAN_WARM_MAX_EMBED_MODELS", "1")))
+WARM_JOB_WINDOW = int(os.getenv("TITAN_WARM_JOB_WINDOW", "50"))
+WARM_EVICT = os.getenv("TITAN_WARM_EVICT", "true").lower() == "true"
+
+# --- TELEMETRY SAMPLER ---
+# Hardware is sampled in the background; heartbeats read the cached snapshot.
+# The interval stretches while readings are stable and snaps back near the thermal limit.
+TELEMETRY_MIN_INTERVAL = float(os.getenv("TITAN_TELEMETRY_MIN_INTERVAL", "1.0"))
+TELEMETRY_MAX_INTERVAL = float(os.getenv("TITAN_TELEMETRY_MAX_INTERVAL", "15.0"))
+TELEMETRY_HOT_MARGIN_C = float(os.getenv("TITAN_TELEMETRY_HOT_MARGIN_C", "10"))
+
+# --- THERMAL GOVERNOR ---
+# Admitted concurrency and batch size shrink as thermal/power headroom runs out,
+# so the node sheds load before the firmware throttles the clocks. num_ctx is left
+# alone: a smaller context would force Ollama to reload the model.
+GOVERNOR_SOFT_MARGIN_C = float(os.getenv("TITAN_GOVERNOR_SOFT_MARGIN_C", "8"))
+GOVERNOR_RISE_C_PER_MIN = float(os.getenv("TITAN_GOVERNOR_RISE_C_PER_MIN", "3"))
+GOVERNOR_POWER_BUDGET_W = float(os.getenv("TITAN_POWER_BUDGET_W", "0"))  # 0 = no power cap
+GOVERNOR_STEP_INTERVAL = float(os.getenv("TITAN_GOVERNOR_STEP_INTERVAL", "10"))
+GOVERNOR_WINDOW = 12
+GOVERNOR_RETRY_AFTER = 30
+DEFAULT_NUM_CTX = 8192
+DEFAULT_NUM_BATCH = 512
+
+# --- CONTEXT SIZING ---
+# num_ctx is sized per job from an estimated prompt length plus the output budget, snapped
+# to a few fixed tiers. Ollama reloads the runner whenever num_ctx changes, so a loaded
+# model keeps its size while jobs fit and only grows; it can shrink on the next cold load.
+NUM_CTX_TIERS = sorted(int(t) for t in os.getenv("TITAN_NUM_CTX_TIERS", "2048,4096,8192,16384,32768").split(","))
+DEFAULT_NUM_PREDICT = int(os.getenv("TITAN_DEFAULT_NUM_PREDICT", "1024"))  # output reserve when the job sets none
+CHARS_PER_TOKEN = 4.0  # starting estimate until Ollama's prompt_eval_count calibrates a model
+PROMPT_TEMPLATE_TOKENS = 64  # chat template / system prompt overhead
+CTX_HEADROOM = 1.1
+CTX_STABLE_WINDOW = 32  # recent jobs whose needs set the size used on a cold load
+
+# --- HEARTBEAT PROTOCOL ---
+# "full" JSON heartbeats stay the default for old dispatchers. A dispatcher that
+# sends {"type": "protocol", "heartbeat": "delta", "encoding": "msgpack"} switches
+# this uplink to sequenced deltas (static identity lives in the handshake only).
+HEARTBEAT_KEYFRAME_EVERY = max(1, int(os.getenv("TITAN_HEARTBEAT_KEYFRAME_EVERY", "30")))
+WS_COMPRESSION = os.getenv("TITAN_WS_COMPRESSION", "true").lower() == "true"
+STATIC_TELEMETRY_FIELDS = ("node_id", "wallet_address", "hardware")
+HEARTBEAT_MODES = ["full", "delta"]
+WIRE_ENCODINGS = ["json", "msgpack"] if msgpack is not None else ["json"]
+
+# --- RECONNECT / LINK HEALTH ---
+# Decorrelated jitter: each wait is drawn from [base, 3 x previous wait], capped, so a
+# fleet dropped by a dispatcher restart spreads its reconnects instead of arriving in waves.
+RECONNECT_BASE_DELAY = float(os.getenv("TITAN_RECONNECT_BASE_DELAY", "1.0"))
+RECONNECT_MAX_DELAY = float(os.getenv("TITAN_RECONNECT_MAX_DELAY", "60"))
+RECONNECT_STABLE_AFTER = float(os.getenv("TITAN_RECONNECT_STABLE_AFTER", "30"))  # uplink age that resets the backoff
+# Websocket ping/pong keepalive; a link that misses a pong for WS_PING_TIMEOUT is declared dead
+WS_PING_INTERVAL = float(os.getenv("TITAN_WS_PING_INTERVAL", "10"))
+WS_PING_TIMEOUT = float(os.getenv("TITAN_WS_PING_TIMEOUT", "10"))
+# Resume tokens issued by the dispatcher are honoured locally for at most this long
+RESUME_MAX_TTL = float(os.getenv("TITAN_RESUME_MAX_TTL", "120"))
+
+# --- RESULT CACHE & SHARED PREFIXES ---
+# Exact duplicates (retries, fan-out) are answered locally. Jobs with a shared
+# `prefix` run untemplated (raw) as prefix + prompt; the backend's own KV cache
+# reuses the prefix across requests (Ollama drops `context` in raw mode).
+RESULT_CACHE_SIZE = int(os.getenv("TITAN_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("TITAN_RESULT_CACHE_TTL", "600"))
+
+
+def _canonical_model(name: str) -> str:
+    """Ollama reports untagged models as ':latest'."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelRegistry:
+    """
+    Cached view of the local Ollama arsenal.
+    available = /api/tags (on disk), loaded = /api/ps (resident in VRAM).
+    """
+
+    def __init__(self, default_model: str):
+        self.default_model = default_model
+        self.available = []
+        self.loaded = []
+        self.embed_models = set()  # known embedding-only models; never a generation fallback
+        self.updated_at: Optional[datetime] = None
+
+    def update(self, available, loaded):
+        self.available = [_canonical_model(m) for m in available]
+        self.loaded = [_canonical_model(m) for m in loaded]
+        self.updated_at = datetime.now()
+
+    def mark_loaded(self, model: str):
+        model = _canonical_model(model)
+        if model not in self.loaded:
+            self.loaded.append(model)
+
+    def mark_unloaded(self, model: str):
+        model = _canonical_model(model)
+        if model in self.loaded:
+            self.loaded.remove(model)
+
+    def can_generate(self, model: str) -> bool:
+        return model not in self.embed_models and "embed" not in model.split(":")[0].rsplit("/", 1)[-1]
+
+    def _family_match(self, model: str, pool) -> Optional[str]:
+        family = model.split(":")[0]
+        for candidate in pool:
+            if candidate.split(":")[0] == family:
+                return candidate
+        return None
+
+    def resolve(self, requested: Optional[str] = None) -> str:
+        """
+        Picks the model for a job. Exact matches win; otherwise prefer weights
+        already in VRAM so the job does not pay a cold load. Without a request
+        the default family wins over warm models of other families, and
+        embedding models are never picked for generation.
+        """
+        if not self.available:
+            # Inventory unknown: trust the caller and let Ollama decide
+            return requested or self.default_model
+
+        # Fallbacks only ever land on models that can generate
+        loaded = [m for m in self.loaded if self.can_generate(m)]
+        available = [m for m in self.available if self.can_generate(m)]
+        if requested:
+            wanted = _canonical_model(requested)
+            if wanted in self.available:
+                return wanted
+            # Nearest fallback: same family, warm before cold
+            match = self._family_match(wanted, loaded) or self._family_match(wanted, available)
+            if match:
+                return match
+
+        default = _canonical_model(self.default_model)
+        if default in loaded:
+            return default
+        match = self._family_match(default, loaded)
+        if match:
+            return match
+        if default in available:
+            return default
+        match = self._family_match(default, available)
+        if match:
+            return match
+        return (loaded + available or [default])[0]
+
+    def snapshot(self) -> Dict:
+        return {"loaded": list(self.loaded), "available": list(self.available)}
+
+
+class InferenceBackend(ABC):
+    """
+    One inference endpoint. The limb speaks Ollama's /api/generate dialect
+    internally; subclasses translate requests and replies for their server.
+    Model names inside the limb are Ollama-style (tagged); `available` and
+    `loaded` hold the server's own ids and model_id() maps between them.
+    Tracks outstanding requests and a circuit breaker for the balancer.
+    """
+
+    kind = "base"
+    supports_keep_alive = False  # explicit load/unload
+
+    def __init__(self, url: str, parallel: int):
+        self.url = url
+        self.parallel = max(1, parallel)
+        self.name = f"{self.kind}@{url.split('://')[-1]}"
+        self.outstanding = 0
+        self.available = []
+        self.loaded = []
+        self.failures = 0  # consecutive
+        self.opened_at = None  # loop time the circuit opened
+        self.trial = False  # half-open request in flight
+        self.requests = 0
+        self.errors = 0
+
+    def state(self, now: float) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if now - self.opened_at >= BACKEND_OPEN_SECONDS else "open"
+
+    def usable(self, now: float) -> bool:
+        state = self.state(now)
+        return state == "closed" or (state == "half_open" and not self.trial)
+
+    def model_id(self, model: str) -> str:
+        """The server's id for a (tagged) model name."""
+        return model
+
+    def serves(self, model: str) -> bool:
+        return not self.available or self.model_id(model) in self.available
+
+    def holds(self, model: str) -> bool:
+        return self.model_id(model) in self.loaded
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"[BACKEND] {self.name} recovered. Circuit closed.")
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self, now: float):
+        self.errors += 1
+        self.failures += 1
+        self.trial = False
+        if self.opened_at is not None or self.failures >= BACKEND_FAILURE_THRESHOLD:
+            if self.opened_at is None:
+                logger.warning(f"[BACKEND] {self.name} failing ({self.failures}x). Circuit open for {BACKEND_OPEN_SECONDS:.0f}s.")
+            self.opened_at = now
+
+    def headers(self) -> Dict:
+        return {}
+
+    @abstractmethod
+    def generate_request(self, payload: dict):
+        """Returns (path, body) for an Ollama-style generate payload."""
+
+    @abstractmethod
+    def parse_response(self, data: dict) -> Dict:
+        """Normalizes a buffered reply to Ollama's final response object."""
+
+    @abstractmethod
+    def iter_chunks(self, resp) -> AsyncIterator[Dict]:
+        """Async generator of Ollama-style stream objects ({"response", "done", stats...})."""
+
+    @abstractmethod
+    def embed_request(self, model: str, inputs: list):
+        """Returns (path, body) for embedding `inputs`."""
+
+    @abstractmethod
+    def parse_embeddings(self, data: dict) -> list:
+        """Embedding vectors in input order."""
+
+    @abstractmethod
+    async def list_models(self, session, timeout):
+        """Returns (available, loaded) model ids as the server names them. Doubles as the health check."""
+
+    def snapshot(self, now: float) -> Dict:
+        return {
+            "kind": self.kind,
+            "url": self.url,
+            "state": self.state(now),
+            "outstanding": self.outstanding,
+            "parallel": self.parallel,
+            "free": max(0, self.parallel - self.outstanding),
+            "requests": self.requests,
+            "errors": self.errors,
+            "loaded": list(self.loaded)
+        }
+
+
+class OllamaBackend(InferenceBackend):
+    kind = "ollama"
+    supports_keep_alive = True
+
+    def generate_request(self, payload: dict):
+        return "/api/generate", payload
+
+    def parse_response(self, data: dict) -> Dict:
+        return data
+
+    async def iter_chunks(self, resp):
+        async for line in resp.content:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def embed_request(self, model: str, inputs: list):
+        return "/api/embed", {"model": model, "input": inputs, "keep_alive": WARM_KEEP_ALIVE}
+
+    def parse_embeddings(self, data: dict) -> list:
+        return data.get("embeddings", [])
+
+    async def list_models(self, session, timeout):
+        async def fetch(endpoint):
+            async with session.get(f"{self.url}{endpoint}", timeout=timeout) as resp:
+                if resp.status != 200:
+                    raise RuntimeError(f"{endpoint} HTTP {resp.status}")
+                data = await resp.json()
+                return [m['name'] for m in data.get('models', [])]
+        available, loaded = await asyncio.gather(fetch("/api/tags"), fetch("/api/ps"))
+        return available, loaded
+
+
+class OpenAIBackend(InferenceBackend):
+    """
+    OpenAI-compatible server (llama.cpp server, vLLM). Models stay resident server-side.
+    Templated jobs go to /v1/chat/completions, the counterpart of Ollama's templated
+    /api/generate; raw (prefix) jobs go to the untemplated /v1/completions.
+    """
+
+    kind = "openai"
+
+    def __init__(self, url: str, parallel: int):
+        super().__init__(url[:-3] if url.endswith("/v1") else url, parallel)
+
+    def model_id(self, model: str) -> str:
+        # /v1/models ids are untagged ("meta-llama/Llama-3-8B"); the registry tags them ":latest"
+        if model.endswith(":latest") and model not in self.available and model[:-len(":latest")] in self.available:
+            return model[:-len(":latest")]
+        return model
+
+    def headers(self) -> Dict:
+        return {"Authorization": f"Bearer {OPENAI_API_KEY}"} if OPENAI_API_KEY else {}
+
+    def generate_request(self, payload: dict):
+        options = payload.get("options", {})
+        body = {"model": self.model_id(payload["model"]), "stream": payload["stream"]}
+        if payload.get("raw"):
+            path = "/v1/completions"
+            body["prompt"] = payload["prompt"]
+        else:
+            path = "/v1/chat/completions"
+            body["messages"] = [{"role": "user", "content": payload["prompt"]}]
+        if "temperature" in options:
+            body["temperature"] = options["temperature"]
+        if options.get("num_predict", -1) > 0:
+            body["max_tokens"] = options["num_predict"]
+        if payload["stream"]:
+            body["stream_options"] = {"include_usage": True}
+        return path, body
+
+    @staticmethod
+    def _usage(data: dict) -> Dict:
+        usage = data.get("usage") or {}
+        stats = {}
+        if "prompt_tokens" in usage:
+            stats["prompt_eval_count"] = usage["prompt_tokens"]
+        if "completion_tokens" in usage:
+            stats["eval_count"] = usage["completion_tokens"]
+        return stats
+
+    @staticmethod
+    def _choice_text(choice: dict, key: str) -> str:
+        """Text of a completions choice ("text") or a chat choice (`key` is "message", or "delta" when streaming)."""
+        if "text" in choice:
+            return choice["text"] or ""
+        return (choice.get(key) or {}).get("content") or ""
+
+    def parse_response(self, data: dict) -> Dict:
+        choices = data.get("choices") or [{}]
+        return {"model": data.get("model"), "response": self._choice_text(choices[0], "message"), "done": True,
+                **self._usage(data)}
+
+    async def iter_chunks(self, resp):
+        final = {"done": True}
+        async for line in resp.content:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            event = json.loads(data)
+            if event.get("error"):
+                yield {"error": str(event["error"])}
+                return
+            final.update(self._usage(event))
+            for choice in event.get("choices") or []:
+                text = self._choice_text(choice, "delta")
+                if text:
+                    yield {"response": text, "done": False}
+        yield final
+
+    def embed_request(self, model: str, inputs: list):
+        return "/v1/embeddings", {"model": self.model_id(model), "input": inputs}
+
+    def parse_embeddings(self, data: dict) -> list:
+        return [d["embedding"] for d in sorted(data.get("data", []), key=lambda d: d.get("index", 0))]
+
+    async def list_models(self, session, timeout):
+        async with session.get(f"{self.url}/v1/models", headers=self.headers(), timeout=timeout) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"/v1/models HTTP {resp.status}")
+            models = [m['id'] for m in (await resp.json()).get('data', [])]
+        return models, models
+
+
+BACKEND_KINDS = {"ollama": OllamaBackend, "openai": OpenAIBackend}
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+class BackendBalancer:
+    """
+    Routes each request to the usable backend serving the model with the
+    fewest outstanding requests relative to its parallelism, preferring
+    backends that already hold the model in memory.
+    """
+
+    def __init__(self, backends: list):
+        self.backends = backends
+
+    @classmethod
+    def from_specs(cls, specs: list) -> "BackendBalancer":
+        backends = []
+        for kind, url, parallel in specs:
+            if kind not in BACKEND_KINDS:
+                logger.error(f"[BACKEND] Unknown backend kind '{kind}' for {url}. Skipped.")
+                continue
+            backends.append(BACKEND_KINDS[kind](url, parallel))
+        return cls(backends)
+
+    @property
+    def capacity(self) -> int:
+        return sum(b.parallel for b in self.backends)
+
+    def acquire(self, model: str, exclude=()) -> Optional[InferenceBackend]:
+        """Leases the best backend for `model`, or None when none is usable."""
+        now = asyncio.get_running_loop().time()
+        candidates = [b for b in self.backends if b not in exclude and b.usable(now) and b.serves(model)]
+        if not candidates:
+            return None
+        backend = min(candidates, key=lambda b: (b.outstanding >= b.parallel, not b.holds(model),
+                                                 b.outstanding / b.parallel))
+        if backend.state(now) == "half_open":
+            backend.trial = True
+        backend.outstanding += 1
+        return backend
+
+    def release(self, backend: InferenceBackend):
+        backend.outstanding -= 1
+        backend.requests += 1
+        backend.trial = False  # an undecided trial (e.g. cancelled) lets the next request try again
+
+    def ollama(self, model: Optional[str] = None) -> list:
+        """Usable Ollama backends (optionally only those that have `model` on disk)."""
+        now = asyncio.get_running_loop().time()
+        return [b for b in self.backends if b.supports_keep_alive and b.usable(now) and (model is None or b.serves(model))]
+
+    def snapshot(self) -> Dict:
+        now = asyncio.get_running_loop().time()
+        return {b.name: b.snapshot(now) for b in self.backends}
+
+
+class ThermalGovernor:
+    """
+    Maps temperature/power readings to an allowed concurrency and a batch
+    scale. Steps are rate-limited to GOVERNOR_STEP_INTERVAL for hysteresis;
+    entering cooldown is immediate.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.allowed = max_concurrency
+        self.batch_scale = 1.0
+        self.cooldown = False
+        self.trend = 0.0  # degC per minute
+        self._history = deque(maxlen=GOVERNOR_WINDOW)
+        self._last_step = float("-inf")
+
+    @property
+    def throttled(self) -> bool:
+        return self.allowed < self.max_concurrency
+
+    def update(self, gpu_temp: float, power: float, cooldown: bool, now: float) -> bool:
+        """Feeds one sample. Returns True when the allowed concurrency changed."""
+        self._history.append((now, gpu_temp))
+        (t0, temp0), (t1, temp1) = self._history[0], self._history[-1]
+        self.trend = (temp1 - temp0) / (t1 - t0) * 60 if t1 > t0 else 0.0
+        previous = self.allowed
+
+        self.cooldown = cooldown
+        if cooldown:
+            self.allowed = 0
+            self.batch_scale = 0.5
+            self._last_step = now
+            return self.allowed != previous
+
+        if now - self._last_step < GOVERNOR_STEP_INTERVAL and self.allowed > 0:
+            return False
+
+        headroom = MAX_SAFE_TEMP_C - gpu_temp
+        over_power = GOVERNOR_POWER_BUDGET_W > 0 and power > GOVERNOR_POWER_BUDGET_W
+        heating = self.trend > GOVERNOR_RISE_C_PER_MIN and headroom < 2 * GOVERNOR_SOFT_MARGIN_C
+        if headroom < GOVERNOR_SOFT_MARGIN_C or over_power or heating:
+            self.allowed = max(1, self.allowed - 1)
+            self.batch_scale = 0.5
+        elif self.allowed == 0 or (headroom >= 2 * GOVERNOR_SOFT_MARGIN_C and self.trend <= 0):
+            self.allowed = min(self.max_concurrency, self.allowed + 1)
+            if self.allowed == self.max_concurrency:
+                self.batch_scale = 1.0
+
+        if self.allowed != previous:
+            self._last_step = now
+            return True
+        return False
+
+    def snapshot(self) -> Dict:
+        return {"allowed": self.allowed, "batch_scale": self.batch_scale, "trend_c_per_min": round(self.trend, 1)}
+
+
+class ContextPlanner:
+    """
+    Picks num_ctx per job. Prompt tokens are estimated from a chars-per-token
+    ratio learned per model from Ollama's prompt_eval_count; sizes snap to
+    NUM_CTX_TIERS and stick to what the model was loaded with.
+    """
+
+    def __init__(self):
+        self.chars_per_token = {}  # {model: smoothed ratio}
+        self.resident = {}  # {model: num_ctx the runner was last loaded with}
+        self.recent = {}  # {model: deque of tiers recent jobs needed}
+
+    def estimate_tokens(self, model: str, chars: int) -> int:
+        return int(chars / self.chars_per_token.get(model, CHARS_PER_TOKEN)) + 1
+
+    def observe(self, model: str, chars: int, prompt_eval_count: Optional[int]):
+        """Calibrates the model's ratio. Short prompts are too noisy and skipped."""
+        if chars < 256 or not prompt_eval_count:
+            return
+        # Ollama's prompt cache can hide evaluated tokens; clamp so that cannot run away
+        ratio = min(8.0, max(1.5, chars / prompt_eval_count))
+        previous = self.chars_per_token.get(model)
+        self.chars_per_token[model] = ratio if previous is None else 0.8 * previous + 0.2 * ratio
+
+    @staticmethod
+    def tier_for(tokens: int) -> int:
+        for tier in NUM_CTX_TIERS:
+            if tier >= tokens:
+                return tier
+        return NUM_CTX_TIERS[-1]
+
+    def plan(self, model: str, needed_tokens: int, loaded: bool) -> int:
+        tier = self.tier_for(int(needed_tokens * CTX_HEADROOM))
+        recent = self.recent.setdefault(model, deque(maxlen=CTX_STABLE_WINDOW))
+        recent.append(tier)
+        resident = self.resident.get(model) if loaded else None
+        if resident and resident >= tier:
+            return resident  # no reload
+        # Growing (or loading cold): size for the recent mix so the next job does not reload again
+        return max(recent)
+
+    def loaded_with(self, model: str, num_ctx: int):
+        self.resident[model] = num_ctx
+
+    def preload_ctx(self, model: str) -> int:
+        """Size the warm keeper loads a model with, matching what its jobs will ask for."""
+        return self.resident.get(model) or max(self.recent.get(model) or [DEFAULT_NUM_CTX])
+
+    def snapshot(self) -> Dict:
+        return {
+            "resident": dict(self.resident),
+            "chars_per_token": {m: round(r, 2) for m, r in self.chars_per_token.items()}
+        }
+
+
+def _dict_delta(previous: dict, current: dict) -> dict:
+    """Fields of `current` that differ from `previous`; nested dicts recurse, removed keys map to None."""
+    delta = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            sub = _dict_delta(old, value)
+            if sub:
+                delta[key] = sub
+        elif key not in previous or old != value:
+            delta[key] = value
+    for key in previous:
+        if key not in current:
+            delta[key] = None
+    return delta
+
+
+def _pack_f32(vectors: list) -> str:
+    """Row-major little-endian float32, base64 encoded."""
+    packed = array("f", (x for vector in vectors for x in vector))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+async def _run_bounded(calls: list, concurrency: int):
+    """Awaits each zero-argument coroutine factory in `calls`, at most `concurrency` at a time."""
+    pending = iter(calls)
+
+    async def worker():
+        for call in pending:
+            await call()
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(calls))))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+def _cache_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _result_cache_key(model: str, prefix: str, prompt: str, options: dict) -> str:
+    """Only what decides the output; num_ctx/num_batch move with planner and governor state."""
+    return _cache_key(model, prefix, prompt, options.get("temperature"), options.get("num_predict"))
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry. Counts hits and misses for telemetry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # {key: (expires_at, value)}
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > datetime.now().timestamp():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (datetime.now().timestamp() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+class Histogram:
+    """Cumulative-bucket histogram with a bucket-interpolated quantile estimate."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= rank:
+                fraction = (rank - seen) / self.counts[i] if self.counts[i] else 0
+                return lower + (bound - lower) * fraction
+            seen += self.counts[i]
+            lower = bound
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Hot-path histograms and counters, rendered for Prometheus and summarized for telemetry."""
+
+    HISTOGRAMS = {
+        "queue_wait_seconds": ("Time a job waited for an inference slot", LATENCY_BUCKETS),
+        "ttft_seconds": ("Ollama time to first token", LATENCY_BUCKETS),
+        "generation_seconds": ("Total Ollama generation time", LATENCY_BUCKETS),
+        "tokens_per_second": ("Decode throughput from eval_count/eval_duration", RATE_BUCKETS),
+        "heartbeat_send_seconds": ("Websocket send latency for heartbeats", LATENCY_BUCKETS),
+        "telemetry_sample_seconds": ("Hardware telemetry sampling time", LATENCY_BUCKETS),
+    }
+    COUNTERS = {
+        "jobs_total": "Jobs executed",
+        "jobs_failed_total": "Jobs that returned an error",
+        "reconnects_total": "Uplink reconnects",
+        "jobs_cancelled_total": "Jobs cancelled by the dispatcher or the janitor",
+        "jobs_preempted_total": "Running jobs preempted by higher-priority work",
+        "embed_inputs_total": "Texts embedded by embed jobs",
+        "batch_items_total": "Prompts completed by batch_generate jobs",
+    }
+
+    def __init__(self, prefix: str = "titan_limb"):
+        self.prefix = prefix
+        self.histograms = {name: Histogram(buckets) for name, (_, buckets) in self.HISTOGRAMS.items()}
+        self.counters = {name: 0 for name in self.COUNTERS}
+
+    def observe(self, name: str, value: float):
+        self.histograms[name].observe(value)
+
+    def inc(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for name, (help_text, _) in self.HISTOGRAMS.items():
+            hist = self.histograms[name]
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f"{metric}_sum {hist.sum}")
+            lines.append(f"{metric}_count {hist.count}")
+        for name, help_text in self.COUNTERS.items():
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter", f"{metric} {self.counters[name]}"]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict:
+        """p50 of the routing-relevant histograms (rounded so heartbeats stay delta-friendly)."""
+        out = {}
+        for key, name in (("tps", "tokens_per_second"), ("ttft_s", "ttft_seconds"),
+                          ("gen_s", "generation_seconds"), ("queue_s", "queue_wait_seconds")):
+            value = self.histograms[name].quantile(0.5)
+            if value is not None:
+                out[key] = round(value, 2)
+        out["jobs"] = self.counters["jobs_total"]
+        return out
+
+class JobJournal:
+    """
+    Append-only JSON-lines journal of job lifecycle events:
+      {"ev": "accept", "job_id", "ts"}  {"ev": "complete", "job_id", "ts", "result"}  {"ev": "ack", "job_id", "ts"}
+    Results stay undelivered until acked or older than JOURNAL_RETENTION.
+    The file is rewritten with only live entries at startup and when it grows past JOURNAL_COMPACT_BYTES.
+    The in-memory view updates on the caller's thread; writes, flushes, fsyncs and compactions
+    run on a background writer thread so slow storage never stalls the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pending = {}  # {job_id: accepted ts}
+        self.unacked = OrderedDict()  # {job_id: (completed ts, result payload)}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load()
+        self.pending.clear()  # interrupted jobs are not resumed; the dispatcher reassigns them
+        self._expire()
+        # The writer thread's own view of the live entries, as serialized lines: {job_id: (ev, ts, line)}
+        self._live = OrderedDict(
+            (job_id, ("complete", ts, json.dumps({"ev": "complete", "job_id": job_id, "ts": ts, "result": result})))
+            for job_id, (ts, result) in self.unacked.items()
+        )
+        self._fh = None
+        self._compact()
+        self._queue = queue.SimpleQueue()
+        self._stop_token = object()
+        self._writer = threading.Thread(target=self._write_loop, name="titan-journal", daemon=True)
+        self._writer.start()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                self._apply(record)
+        if self.pending:
+            logger.warning(f"[JOURNAL] {len(self.pending)} job(s) were interrupted before completion")
+        if self.unacked:
+            logger.info(f"[JOURNAL] {len(self.unacked)} undelivered result(s) recovered")
+
+    def _apply(self, record: dict):
+        job_id, ev = record.get("job_id"), record.get("ev")
+        if ev == "accept":
+            self.pending[job_id] = record["ts"]
+        elif ev == "complete":
+            self.pending.pop(job_id, None)
+            self.unacked[job_id] = (record["ts"], record["result"])
+        elif ev == "ack":
+            self.pending.pop(job_id, None)
+            self.unacked.pop(job_id, None)
+
+    def _append(self, record: dict):
+        self._apply(record)
+        # Serialized here: the result payload may change after this call returns
+        self._queue.put((record["ev"], record["job_id"], record["ts"], json.dumps(record)))
+
+    def _write_loop(self):
+        """Drains queued records in batches: one flush (and fsync) per batch."""
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [item for item in batch if item is not self._stop_token]
+            for ev, job_id, ts, line in entries:
+                if ev == "ack":
+                    self._live.pop(job_id, None)
+                else:
+                    self._live[job_id] = (ev, ts, line)
+            try:
+                self._fh.writelines(line + "\n" for _, _, _, line in entries)
+                self._fh.flush()
+                if JOURNAL_FSYNC:
+                    os.fsync(self._fh.fileno())
+                if self._fh.tell() > JOURNAL_COMPACT_BYTES:
+                    self._compact()
+            except (OSError, ValueError) as e:
+                logger.warning(f"[JOURNAL] Write failed: {e}")
+            if len(entries) < len(batch):
+                self._fh.close()
+                return
+
+    def _expire(self):
+        cutoff = datetime.now().timestamp() - JOURNAL_RETENTION
+        for job_id in [j for j, (ts, _) in self.unacked.items() if ts < cutoff]:
+            del self.unacked[job_id]
+
+    def _compact(self):
+        """Rewrites the journal with live entries only (writer thread, or __init__ before it starts)."""
+        if self._fh:
+            self._fh.close()
+        cutoff = datetime.now().timestamp() - JOURNAL_RETENTION
+        for job_id in [j for j, (ev, ts, _) in self._live.items() if ev == "complete" and ts < cutoff]:
+            del self._live[job_id]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(line + "\n" for _, _, line in self._live.values())
+        os.replace(tmp_path, self.path)
+        self._fh = open(self.path, "a")
+
+    def accepted(self, job_id: str):
+        self._append({"ev": "accept", "job_id": job_id, "ts": datetime.now().timestamp()})
+
+    def completed(self, result: dict):
+        self._append({"ev": "complete", "job_id": result["job_id"], "ts": datetime.now().timestamp(), "result": result})
+
+    def acked(self, job_id: str):
+        if job_id in self.unacked or job_id in self.pending:
+            self._append({"ev": "ack", "job_id": job_id, "ts": datetime.now().timestamp()})
+
+    def undelivered(self) -> list:
+        self._expire()
+        return [result for _, result in self.unacked.values()]
+
+    def close(self):
+        """Writes out everything queued, then closes the file."""
+        self._queue.put(self._stop_token)
+        self._writer.join(timeout=5)
+
+class SandboxPool:
+    """
+    Pre-warmed sandbox containers. Jobs lease an idle container, it is scrubbed
+    on return and recycled after SANDBOX_MAX_USES leases. Every docker-py call
+    runs on the pool's own threads so container churn never blocks the loop.
+    Job commands hold a thread for their whole run, so they get one thread per
+    slot; create/remove/scrub/health calls have their own threads and a kill
+    never waits behind the exec it is meant to stop.
+    """
+
+    def __init__(self, client, size: int = SANDBOX_POOL_SIZE, max_jobs: int = MAX_CONCURRENT_JOBS):
+        self.client = client
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sandbox")
+        self.exec_executor = ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="sandbox-exec")
+        self._idle = deque()
+        self._leased = {}  # {container_id: container}
+        self._uses = {}  # {container_id: lease count}
+        self._fill_task = None
+        self.recycled = 0
+
+    async def _call(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def _create_container(self):
+        return self.client.containers.run(
+            SANDBOX_IMAGE,
+            command=["sleep", "infinity"],
+            detach=True,
+            working_dir="/tmp",
+            network_disabled=True,
+            mem_limit=SANDBOX_MEM_LIMIT,
+            pids_limit=256,
+            cap_drop=["ALL"],
+            security_opt=["no-new-privileges"],
+            labels={"titan.sandbox": NODE_ID}
+        )
+
+    async def _spawn(self):
+        container = await self._call(self._create_container)
+        self._uses[container.id] = 0
+        logger.info(f"[SANDBOX] Container {container.short_id} warmed")
+        return container
+
+    async def _retire(self, container):
+        self._uses.pop(container.id, None)
+        self.recycled += 1
+        try:
+            await self._call(container.remove, force=True)
+        except Exception as e:
+            logger.warning(f"[SANDBOX] Failed to remove {container.short_id}: {e}")
+
+    async def fill(self):
+        while len(self._idle) < self.size:
+            self._idle.append(await self._spawn())
+
+    def _replenish(self):
+        """Refills the pool in the background after a container is retired."""
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.create_task(self.fill())
+
+    async def lease(self):
+        """Returns an idle container, or starts a cold one if the pool is drained."""
+        container = self._idle.popleft() if self._idle else await self._spawn()
+        self._leased[container.id] = container
+        self._uses[container.id] = self._uses.get(container.id, 0) + 1
+        return container
+
+    async def release(self, container, healthy: bool = True):
+        """Scrubs and re-pools a container, or retires it when worn out, unhealthy or surplus."""
+        if self._leased.pop(container.id, None) is None:
+            return  # already killed by the janitor
+        if len(self._idle) >= self.size:
+            await self._retire(container)
+            return
+        if not healthy or self._uses.get(container.id, 0) >= SANDBOX_MAX_USES:
+            await self._retire(container)
+            self._replenish()
+            return
+        try:
+            await self._call(container.exec_run, ["sh", "-c", "rm -rf /tmp/* /tmp/.[!.]* 2>/dev/null; true"])
+            self._idle.append(container)
+        except Exception as e:
+            logger.warning(f"[SANDBOX] Scrub failed for {container.short_id}: {e}")
+            await self._retire(container)
+            self._replenish()
+
+    async def run(self, container, command: list, timeout: float):
+        """Executes `command` inside a leased container. Returns (exit_code, output bytes)."""
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.exec_executor,
+            functools.partial(container.exec_run, ["timeout", str(int(timeout)), *command], workdir="/tmp")
+        )
+        return result.exit_code, result.output
+
+    def forget(self, container_id: str):
+        self._leased.pop(container_id, None)
+        self._uses.pop(container_id, None)
+
+    async def maintain_loop(self):
+        """Keeps the pool full and replaces idle containers that stopped running."""
+        while True:
+            try:
+                for container in list(self._idle):
+                    await self._call(container.reload)
+                    if container.status != "running":
+                        logger.warning(f"[SANDBOX] Container {container.short_id} unhealthy ({container.status})")
+                        self._idle.remove(container)
+                        await self._retire(container)
+                await self.fill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[SANDBOX] Maintenance error: {e}")
+            await asyncio.sleep(SANDBOX_HEALTH_INTERVAL)
+
+    async def close(self):
+        if self._fill_task is not None:
+            self._fill_task.cancel()
+        containers = list(self._idle) + list(self._leased.values())
+        self._idle.clear()
+        self._leased.clear()
+        for container in containers:
+            await self._retire(container)
+        self.executor.shutdown(wait=False)
+        self.exec_executor.shutdown(wait=False)
+
+    def snapshot(self) -> Dict:
+        return {"idle": len(self._idle), "leased": len(self._leased), "size": self.size, "recycled": self.recycled}
 
 class TitanLimb:
-    def __init__(self, connect_url=None, wallet=None, container_mode=False):
+    def __init__(self, connect_url=None, wallet=None, container_mode=False, max_concurrency=None, backends=None):
+        _import_network_stack()
         self.uri = connect_url if connect_url else WEBSOCKET_URL
 
         # Strict identity: only accept SI64_WALLET_ADDRESS (no legacy fallbacks)
@@ -166,73 +1483,336 @@ class TitanLimb:
             self.headers["wallet_address"] = self.wallet
         except Exception:
             pass
-        self.is_busy = False
         self.reconnect_attempts = 0
-        self.ollama_url = TITAN_OLLAMA_HOST
+        self.reconnect_delay = RECONNECT_BASE_DELAY
+        # Session resume: {"token": str, "expires": loop time} issued by the dispatcher
+        self.resume = None
+        # Inference endpoints ("[kind=]url[#parallel]" specs override TITAN_BACKENDS)
+        self.backends = BackendBalancer.from_specs(_parse_backend_specs(",".join(backends)) if backends else BACKEND_SPECS)
         self.container_mode = container_mode or CONTAINER_MODE
-        self.docker_client = DOCKER_CLIENT
+        self.docker_client = None  # connected in run() when container mode is on
+        self.sandbox = None
         
         # Active job tracking for janitor loop
-        self.active_jobs = {}  # {job_id: {"start_time": timestamp, "container_id": id}}
+        self.active_jobs = {}  # {job_id: {"start_time": timestamp, "container_id": id, "progress_at": bulk jobs only}}
         self.job_timeout = 300  # 5 minutes max execution time
+
+        # Hot-path latency instrumentation
+        self.metrics = MetricsRegistry()
+        self._enqueued_at = {}  # {job_id: loop time}
+
+        # Durable record of accepted jobs and undelivered results
+        self.journal = None  # opened in run()
+
+        # Bounded job scheduler: jobs wait in job_queue until a slot frees up,
+        # results and heartbeats leave through a single outbox drained by the sender.
+        self.max_concurrency = max(1, int(max_concurrency or os.getenv("TITAN_MAX_CONCURRENT_JOBS") or self.backends.capacity))
+        self.governor = ThermalGovernor(self.max_concurrency)
+        self._capacity = asyncio.Condition()  # notified when a slot frees or the governor moves
+        # Queue entries are (-priority, seq, job): higher priority first, FIFO within a priority.
+        self.job_queue = asyncio.PriorityQueue(maxsize=JOB_QUEUE_DEPTH or self.max_concurrency * 4)
+        self.outbox = asyncio.Queue()
+        self.job_tasks = {}  # {job_id: asyncio.Task}
+        self._job_seq = itertools.count()
+        self._running = {}  # {job_id: queue entry} for preemption and requeue
+        self._cancel_reasons = {}  # {job_id: "CANCELLED" | "TIMEOUT" | "PREEMPTED"} set before task.cancel()
+        self._cancelled_queued = set()  # queued job ids to drop when they reach the front
+        self.jetson = None
+
+        # Shared Ollama session (created lazily on the running loop)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # Cached model inventory for routing and handshake advertisement
+        self.models = ModelRegistry(TARGET_MODEL)
+        self.models.embed_models.add(_canonical_model(EMBED_MODEL))
+        self.ctx_planner = ContextPlanner()
+
+        # Warm keeper state
+        self.online = False
+        self.recent_models = deque(maxlen=WARM_JOB_WINDOW)  # generation jobs
+        self.recent_embed_models = deque(maxlen=WARM_JOB_WINDOW)  # embed jobs, warmed on their own budget
+        self.warm_models = {}  # {model: {"load_time": s, "loaded_at": datetime, "refreshed_at": datetime}}
+
+        # Result cache (exact duplicates)
+        self.result_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+        self._inflight = {}  # {cache_key: asyncio.Future} identical jobs share one generation
+
+        # Latest hardware sample, maintained by _telemetry_loop
+        self.hw_snapshot = {"gpu_temp": 0, "power": 0, "thermal": "OK", "cooldown": False, "sampled_at": None}
+        self.telemetry_interval = TELEMETRY_MIN_INTERVAL
+        self.hardware = None  # cached profile, loaded in run()
+        self._linux_sensors = None  # (temp paths, power readers) from the profile
+
+        # Negotiated per uplink; reset to the legacy JSON protocol on every connect
+        self.heartbeat_mode = "full"
+        self.wire_encoding = "json"
+        self._hb_seq = 0
+        self._hb_last = None
+        # Result journaling/replay needs a dispatcher that acks; kept across reconnects
+        # so results finished while the link is down are still journaled
+        self.dispatcher_acks = False
         
         # Thread pool for blocking I/O (Telemetry subprocesses)
         self.executor = ThreadPoolExecutor(max_workers=2)
         
-        # Verify Neural Uplink at Startup
-        self.loop = asyncio.get_event_loop()
-        self.loop.create_task(self._verify_ollama_link())
-        self.loop.create_task(self._janitor_loop())
+        # Nothing touches the network, disk or event loop until run()
         
         logger.info(f"[SECURITY] Container Mode: {'ENABLED' if self.container_mode else 'DISABLED'}")
+        logger.info(f"[SCHEDULER] Concurrency: {self.max_concurrency} slots, queue depth {self.job_queue.maxsize}")
+
+    @property
+    def active_job_count(self) -> int:
+        return len(self.job_tasks)
+
+    @property
+    def is_busy(self) -> bool:
+        """True when every inference slot is occupied."""
+        return self.active_job_count >= max(1, self.governor.allowed)
+
+    # --- OLLAMA CONNECTION POOL ---
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the shared Ollama session, building it on first use or after a reset."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=OLLAMA_POOL_SIZE * max(1, len(self.backends.backends)),
+                limit_per_host=OLLAMA_POOL_SIZE,
+                keepalive_timeout=OLLAMA_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(total=self.job_timeout, sock_connect=OLLAMA_CONNECT_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logger.info(f"[POOL] Ollama session opened (pool: {OLLAMA_POOL_SIZE}, keepalive: {OLLAMA_KEEPALIVE_TIMEOUT:.0f}s)")
+        return self._session
+
+    async def close(self):
+        """Releases network resources held by the limb."""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("[POOL] Ollama session closed.")
+
+    async def _probe_backend(self, backend: InferenceBackend):
+        session = await self._get_session()
+        available, loaded = await backend.list_models(session, aiohttp.ClientTimeout(total=OLLAMA_PROBE_TIMEOUT))
+        backend.available = list(available)  # server ids; the registry canonicalizes its merged view
+        backend.loaded = list(loaded)
+
+    async def _refresh_model_inventory(self) -> Dict:
+        """
+        Health-checks every backend and merges their inventories into the registry
+        (available = on disk / served, loaded = resident). Returns {backend name: error}.
+        """
+        backends = self.backends.backends
+        results = await asyncio.gather(*(self._probe_backend(b) for b in backends), return_exceptions=True)
+        now = asyncio.get_running_loop().time()
+        errors = {}
+        for backend, result in zip(backends, results):
+            if isinstance(result, Exception):
+                backend.record_failure(now)
+                errors[backend.name] = result
+            else:
+                backend.record_success()
+        healthy = [b for b in backends if b.name not in errors]
+        if healthy:
+            self.models.update(
+                list(dict.fromkeys(m for b in healthy for m in b.available)),
+                list(dict.fromkeys(m for b in healthy for m in b.loaded))
+            )
+        return errors
 
     async def _verify_ollama_link(self):
-        """Checks connectivity to the local AI engine."""
+        """Checks connectivity to the local AI engines."""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.ollama_url}/api/tags") as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        models = [m['name'] for m in data.get('models', [])]
-                        logger.info(f"NEURAL UPLINK ONLINE. ARSENAL: {len(models)} MODELS")
-                    else:
-                        logger.warning(f"NEURAL UPLINK UNSTABLE: HTTP {resp.status}")
+            errors = await self._refresh_model_inventory()
         except Exception as e:
-            logger.critical(f"NEURAL UPLINK FAILED: {e}")
+            errors = {"inventory": e}
+        for name, e in errors.items():
+            if isinstance(e, RuntimeError):
+                logger.warning(f"NEURAL UPLINK UNSTABLE ({name}): {e}")
+            else:
+                logger.critical(f"NEURAL UPLINK FAILED ({name}): {e}")
+        if len(errors) < len(self.backends.backends):
+            logger.info(f"NEURAL UPLINK ONLINE. ARSENAL: {len(self.models.available)} MODELS "
+                        f"({len(self.models.loaded)} LOADED) ON {len(self.backends.backends) - len(errors)} BACKEND(S)")
+        else:
             logger.critical("CHECK OLLAMA SERVICE (systemctl status ollama)")
 
+    # --- MODEL INVENTORY REFRESH / BACKEND HEALTH ---
+    async def _model_refresh_loop(self):
+        """Keeps the cached model inventory current and health-checks backends (reopens or closes circuits)."""
+        while True:
+            try:
+                await asyncio.sleep(MODEL_REFRESH_INTERVAL)
+                errors = await self._refresh_model_inventory()
+                for name, e in errors.items():
+                    logger.warning(f"[BACKEND] Health check failed for {name}: {e}")
+                logger.debug(f"[MODELS] Inventory refreshed: {self.models.snapshot()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[MODELS] Refresh failed: {e}")
+
+    # --- WARM KEEPER (PRELOAD / KEEP-ALIVE / SWAP) ---
+    async def _ollama_keep_alive(self, backend: InferenceBackend, model: str, keep_alive, options: Optional[dict] = None) -> Dict:
+        """
+        Empty-prompt generate (empty-input embed for embedding models): loads the model,
+        or unloads it with keep_alive=0, without inference.
+        """
+        session = await self._get_session()
+        if model in self.models.embed_models:
+            path, payload = "/api/embed", {"model": model, "input": [], "keep_alive": keep_alive}
+        else:
+            path, payload = "/api/generate", {"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive}
+            if options:
+                payload["options"] = options
+        async with session.post(f"{backend.url}{path}", json=payload) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {await resp.text()}")
+            return await resp.json()
+
+    async def _preload_model(self, model: str):
+        start_time = datetime.now()
+        # Load with the context size jobs will use, or the first job would reload the runner.
+        # Every Ollama backend holding the model keeps it warm so the balancer can spread jobs.
+        num_ctx = self.ctx_planner.preload_ctx(model)
+        backends = self.backends.ollama(model)
+        if not backends:
+            return
+        results = await asyncio.gather(*(self._ollama_keep_alive(b, model, WARM_KEEP_ALIVE, {"num_ctx": num_ctx})
+                                         for b in backends), return_exceptions=True)
+        for backend, result in zip(backends, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[WARM] Preload of {model} on {backend.name} failed: {result}")
+            elif not backend.holds(model):
+                backend.loaded.append(backend.model_id(model))
+        data = next((r for r in results if not isinstance(r, Exception)), None)
+        if data is None:
+            return
+        now = datetime.now()
+        entry = self.warm_models.get(model)
+        if entry is None or model not in self.models.loaded:
+            # Ollama reports load_duration in ns; 0 means the weights were already resident
+            load_time = (data.get("load_duration") or 0) / 1e9 or (now - start_time).total_seconds()
+            entry = {"load_time": load_time, "loaded_at": now}
+            self.warm_models[model] = entry
+            logger.info(f"[WARM] {model} resident (load: {load_time:.2f}s, keep_alive: {WARM_KEEP_ALIVE})")
+        entry["refreshed_at"] = now
+        self.models.mark_loaded(model)
+        self.ctx_planner.loaded_with(model, num_ctx)
+
+    async def _evict_model(self, model: str):
+        for backend in self.backends.ollama(model):
+            if backend.holds(model):
+                await self._ollama_keep_alive(backend, model, 0)
+                backend.loaded.remove(backend.model_id(model))
+        self.warm_models.pop(model, None)
+        self.models.mark_unloaded(model)
+        logger.info(f"[WARM] {model} evicted")
+
+    def _job_model(self, job: dict) -> Optional[str]:
+        """The model a queued job will run on (None for sandboxed commands)."""
+        if job.get('command') is not None:
+            return None
+        if job.get('type') == 'embed':
+            return _canonical_model(job.get('model') or EMBED_MODEL)
+        return self.models.resolve(job.get('model'))
+
+    def _eviction_candidates(self, targets: list) -> list:
+        """
+        Models the keeper preloaded itself (/api/ps also lists other tenants' models)
+        that are neither warm targets nor needed by running or queued jobs.
+        """
+        busy = {job.get("model") for job in self.active_jobs.values()}
+        busy.update(self._job_model(entry[2]) for entry in self.job_queue._queue)
+        return [model for model in self.warm_models if model not in targets and model not in busy]
+
+    def _warm_targets(self) -> list:
+        """
+        The most requested generation models in the recent job window (or the configured
+        target), plus the most requested embedding models on their separate budget.
+        """
+        if self.recent_models:
+            ranked = [m for m, _ in Counter(self.recent_models).most_common(WARM_MAX_MODELS)]
+        else:
+            ranked = [TARGET_MODEL]
+        targets = list(dict.fromkeys(self.models.resolve(m) for m in ranked))
+        if WARM_MAX_EMBED_MODELS:
+            targets += [m for m, _ in Counter(self.recent_embed_models).most_common(WARM_MAX_EMBED_MODELS)]
+        return targets
+
+    async def _warm_keeper_loop(self):
+        """Preloads the target model at startup and keeps the working set resident."""
+        first_pass = True
+        while True:
+            try:
+                if not first_pass:
+                    await asyncio.sleep(WARM_REFRESH_INTERVAL)
+                    if not self.online:
+                        continue
+                first_pass = False
+
+                targets = self._warm_targets()
+                for model in targets:
+                    await self._preload_model(model)
+
+                if WARM_EVICT:
+                    for model in self._eviction_candidates(targets):
+                        await self._evict_model(model)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[WARM] Loop error: {e}")
+
+    def _warm_telemetry(self) -> Dict:
+        # Residency is reported as the load timestamp so the value stays stable between heartbeats
+        return {
+            model: {
+                "load_s": round(entry["load_time"], 2),
+                "resident_since": int(entry["loaded_at"].timestamp())
+            }
+            for model, entry in self.warm_models.items()
+        }
+
     # --- JANITOR LOOP (STALE HEARTBEAT CLEANUP) ---
+    def _stale_jobs(self, current_time: datetime) -> list:
+        """(job_id, elapsed, container_id) of jobs past job_timeout; bulk jobs count from their last finished item."""
+        stale_jobs = []
+        for job_id, job_data in self.active_jobs.items():
+            elapsed = (current_time - job_data.get("progress_at", job_data["start_time"])).total_seconds()
+
+            if elapsed > self.job_timeout:
+                stale_jobs.append((job_id, elapsed, job_data.get("container_id")))
+                logger.warning(f"[JANITOR] Job {job_id} STALE (timeout: {elapsed:.0f}s)")
+        return stale_jobs
+
     async def _janitor_loop(self):
         """Monitors active jobs and cleans up stale heartbeats."""
         while True:
             try:
                 await asyncio.sleep(10)  # Check every 10 seconds
-                current_time = datetime.now()
-                stale_jobs = []
-                
-                # Find stale jobs
-                for job_id, job_data in self.active_jobs.items():
-                    elapsed = (current_time - job_data["start_time"]).total_seconds()
-                    
-                    if elapsed > self.job_timeout:
-                        stale_jobs.append((job_id, elapsed, job_data.get("container_id")))
-                        logger.warning(f"[JANITOR] Job {job_id} STALE (timeout: {elapsed:.0f}s)")
+                stale_jobs = self._stale_jobs(datetime.now())
                 
                 # Clean up stale jobs
                 for job_id, elapsed, container_id in stale_jobs:
-                    # Stop container if running
+                    # Scheduled jobs: cancelling the task aborts the Ollama request and retires the container
+                    if self.cancel_job(job_id, "TIMEOUT"):
+                        logger.info(f"[JANITOR] Cancelled stale job {job_id} after {elapsed:.0f}s")
+                        continue
+
+                    # Stop container if running (docker-py blocks; keep it off the loop)
                     if self.container_mode and self.docker_client and container_id:
                         try:
-                            container = self.docker_client.containers.get(container_id)
-                            if container.status == "running":
-                                logger.info(f"[JANITOR] Killing stale container: {container_id}")
-                                container.kill()
-                                container.remove()
+                            await asyncio.get_running_loop().run_in_executor(
+                                self.executor, self._kill_container, container_id
+                            )
+                            if self.sandbox:
+                                self.sandbox.forget(container_id)
                         except Exception as e:
                             logger.error(f"[JANITOR] Failed to kill container {container_id}: {e}")
                     
                     # Remove from tracking
-                    del self.active_jobs[job_id]
+                    self.active_jobs.pop(job_id, None)
                     logger.info(f"[JANITOR] Removed stale job {job_id} after {elapsed:.0f}s")
                 
                 # Log active jobs status
@@ -243,6 +1823,13 @@ class TitanLimb:
                 logger.error(f"[JANITOR] Loop error: {e}")
                 await asyncio.sleep(5)
 
+    def _kill_container(self, container_id: str):
+        container = self.docker_client.containers.get(container_id)
+        if container.status == "running":
+            logger.info(f"[JANITOR] Killing stale container: {container_id}")
+            container.kill()
+        container.remove(force=True)
+
     # --- TRUE SILICON TELEMETRY (HARDENED) ---
     def _read_apple_silicon_sensors(self):
         """
@@ -266,46 +1853,150 @@ class TitanLimb:
         except: 
             return {"gpu_temp": 0, "thermal_status": "NO_SUDO", "power": 0}
 
+    def _read_linux_sensors(self):
+        """Kernel sysfs interrogation (thermal zones + hwmon). No subprocesses."""
+        if self._linux_sensors is None:
+            self._linux_sensors = _discover_linux_sensors()
+        temp_paths, power_readers = self._linux_sensors
+
+        gpu_temp = 0
+        for path in temp_paths:
+            try:
+                with open(path) as f:
+                    gpu_temp = max(gpu_temp, int(f.read().strip()) // 1000)
+            except (OSError, ValueError):
+                continue
+
+        power = 0.0
+        for paths, scale in power_readers:
+            try:
+                value = 1
+                for path in paths:
+                    with open(path) as f:
+                        value *= int(f.read().strip())
+                power = round(value * scale, 1)
+            except (OSError, ValueError):
+                continue
+
+        return {"gpu_temp": gpu_temp, "thermal_status": "OK", "power": power}
+
+    def _read_jetson_sensors(self, jetson_interface):
+        s = jetson_interface.stats
+        return {
+            "gpu_temp": int(s.get('Temp', {}).get('GPU', 0)),
+            "thermal_status": "OK",
+            "power": int((s.get('Power', {}).get('tot', 0) or 0) / 1000.0)
+        }
+
+    async def _sample_hardware(self) -> Dict:
+        # 1. Jetson Orin Logic (jtop keeps stats in memory; no I/O here)
+        if IS_JETSON and self.jetson and self.jetson.ok():
+            return self._read_jetson_sensors(self.jetson)
+        # 2. Apple Silicon Logic (powermetrics subprocess, off the loop)
+        if IS_MAC:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._read_apple_silicon_sensors
+            )
+        # 3. Linux sysfs
+        if SYSTEM == 'linux':
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._read_linux_sensors
+            )
+        return {"gpu_temp": 0, "thermal_status": "OK", "power": 0}
+
+    async def _telemetry_loop(self):
+        """Keeps hw_snapshot fresh with a rate that adapts to thermal headroom."""
+        previous = None
+        while True:
+            try:
+                sample_start = asyncio.get_running_loop().time()
+                sample = await self._sample_hardware()
+                self.metrics.observe("telemetry_sample_seconds", asyncio.get_running_loop().time() - sample_start)
+                gpu_temp = sample["gpu_temp"]
+                thermal = sample["thermal_status"]
+
+                # Thermal Safety Cutoff
+                cooldown = gpu_temp > MAX_SAFE_TEMP_C or thermal in ["HOT", "CRITICAL"]
+                if cooldown and not self.hw_snapshot["cooldown"]:
+                    logger.warning(f"THERMAL CRITICAL: {gpu_temp}°C ({thermal}). THROTTLING.")
+                elif self.hw_snapshot["cooldown"] and not cooldown:
+                    logger.info(f"THERMAL NOMINAL: {gpu_temp}°C. RESUMING.")
+
+                self.hw_snapshot = {
+                    "gpu_temp": gpu_temp,
+                    "power": sample["power"],
+                    "thermal": thermal,
+                    "cooldown": cooldown,
+                    "sampled_at": datetime.now()
+                }
+
+                if self.governor.update(gpu_temp, sample["power"], cooldown, asyncio.get_running_loop().time()):
+                    logger.warning(f"[GOVERNOR] Concurrency -> {self.governor.allowed}/{self.max_concurrency} "
+                                   f"({gpu_temp}°C, {sample['power']}W, trend {self.governor.trend:+.1f}°C/min)")
+                    async with self._capacity:
+                        self._capacity.notify_all()
+
+                near_limit = gpu_temp >= MAX_SAFE_TEMP_C - TELEMETRY_HOT_MARGIN_C or thermal not in ["OK", "NO_SUDO"]
+                stable = previous is not None and (
+                    abs(gpu_temp - previous["gpu_temp"]) < 1
+                    and abs(sample["power"] - previous["power"]) < 0.5
+                    and thermal == previous["thermal_status"]
+                )
+                if near_limit or not stable:
+                    self.telemetry_interval = TELEMETRY_MIN_INTERVAL
+                else:
+                    self.telemetry_interval = min(self.telemetry_interval * 1.5, TELEMETRY_MAX_INTERVAL)
+                previous = sample
+
+            except Exception as e:
+                logger.error(f"[TELEMETRY] Sampler error: {e}")
+                self.telemetry_interval = TELEMETRY_MAX_INTERVAL
+            await asyncio.sleep(self.telemetry_interval)
+
     async def get_telemetry(self, jetson_interface=None) -> Dict:
-        """Aggregates hardware stats for the Brain."""
+        """Aggregates hardware stats for the Brain from the sampler's latest snapshot."""
+        hw = self.hw_snapshot
         stats = {
             "node_id": NODE_ID,
             "wallet_address": self.wallet,
-            "status": "BUSY" if self.is_busy else "IDLE",
+            "status": "COOLDOWN" if hw["cooldown"] else ("BUSY" if self.is_busy else "IDLE"),
             "hardware": "UNIT_ORIN_AGX" if IS_JETSON else "UNIT_APPLE_M_SERIES" if IS_MAC else "UNIT_NVIDIA_CUDA",
-            "specs": {"gpu_temp": 0, "power": 0, "thermal": "OK"}
+            "specs": {"gpu_temp": hw["gpu_temp"], "power": hw["power"], "thermal": hw["thermal"]},
+            "slots": {
+                "max": self.max_concurrency,
+                "active": self.active_job_count,
+                "free": max(0, self.governor.allowed - self.active_job_count),
+                "queued": self.job_queue.qsize()
+            },
+            "governor": self.governor.snapshot(),
+            "journal": {"unacked": len(self.journal.unacked) if self.journal else 0},
+            "metrics": self.metrics.summary(),
+            "models_loaded": list(self.models.loaded),
+            "warm": self._warm_telemetry(),
+            "cache": {"result": self.result_cache.stats()},
+            "ctx": self.ctx_planner.snapshot(),
+            "backends": self.backends.snapshot()
         }
-
-        # 1. Jetson Orin Logic
-        if IS_JETSON and jetson_interface and jetson_interface.ok():
-            s = jetson_interface.stats
-            stats["specs"]["gpu_temp"] = int(s.get('Temp', {}).get('GPU', 0))
-            stats["specs"]["power"] = int((s.get('Power', {}).get('tot', 0) or 0) / 1000.0)
-            
-            # Thermal Safety Cutoff
-            if stats["specs"]["gpu_temp"] > MAX_SAFE_TEMP_C: 
-                logger.warning(f"THERMAL CRITICAL: {stats['specs']['gpu_temp']}°C. THROTTLING.")
-                stats["status"] = "COOLDOWN"
-
-        # 2. Apple Silicon Logic
-        elif IS_MAC:
-            mac_data = await asyncio.get_event_loop().run_in_executor(
-                self.executor, self._read_apple_silicon_sensors
-            )
-            stats["specs"]["thermal"] = mac_data["thermal_status"]
-            stats["specs"]["power"] = mac_data["power"]
-            if mac_data["thermal_status"] in ["HOT", "CRITICAL"]: stats["status"] = "COOLDOWN"
-
+        if self.sandbox:
+            stats["sandbox"] = self.sandbox.snapshot()
         return stats
 
-    # --- INFERENCE ENGINE (OLLAMA ADAPTER) ---
+    # --- INFERENCE ENGINE (BACKEND ADAPTER) ---
     async def execute_task(self, job_data: dict) -> Dict:
         """
-        Routes the intelligence request to the local Ollama instance.
+        Routes the intelligence request to the least-loaded local inference backend.
         Tracks job lifecycle for janitor loop.
         """
+        if job_data.get('command') is not None:
+            return await self.execute_sandboxed(job_data)
+        if job_data.get('type') == 'embed':
+            return await self.execute_embed(job_data)
+        if job_data.get('type') == 'batch_generate':
+            return await self.execute_batch_generate(job_data)
+
         job_id = job_data.get('job_id', 'UNKNOWN')
         prompt = job_data.get('prompt', '')
+        stream = bool(job_data.get('stream', STREAM_RESULTS))
         
         # Track job start
         self.active_jobs[job_id] = {
@@ -314,13 +2005,11 @@ class TitanLimb:
         }
         logger.info(f"[JANITOR] Job {job_id} registered (tracking started)")
         
-        # Strategic Model Selection
-        # Jetson Orin (64GB) -> Heavyweight Commander (70B)
-        # Mac Studio (Unified) -> Agile Architect (32B/70B depends on specific Mac config)
-        # Standard GPU -> Fallback (8B)
-        target_model = "llama3.3:70b" if IS_JETSON else ("qwen2.5-coder:32b" if IS_MAC else "llama3")
+        # Model Routing: honor the job's request, prefer weights already in VRAM
+        target_model = self.models.resolve(job_data.get('model'))
+        self.active_jobs[job_id]["model"] = target_model
+        self.recent_models.append(target_model)
         
-        self.is_busy = True
         logger.info(f"EXECUTING MISSION: {job_id}")
         logger.info(f"MODEL DESIGNATION: {target_model}")
 
@@ -329,31 +2018,49 @@ class TitanLimb:
             "job_id": job_id,
             "node_id": NODE_ID,
             "wallet_address": self.wallet,
+            "model": target_model,
             "result": None
         }
 
         try:
-            # Async HTTP Request (Non-Blocking)
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": target_model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {"num_ctx": 8192, "temperature": 0.7}
-                }
-                
-                start_time = datetime.now()
-                async with session.post(f"{self.ollama_url}/api/generate", json=payload) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        duration = (datetime.now() - start_time).total_seconds()
-                        result_payload["result"] = data.get("response", "")
-                        logger.info(f"MISSION SUCCESS ({duration:.2f}s). INTEL SECURED.")
-                    else:
-                        err_msg = await resp.text()
-                        logger.error(f"OLLAMA ERROR {resp.status}: {err_msg}")
-                        result_payload["result"] = f"ERR: NEURAL ENGINE FAILURE {resp.status}"
-                        
+            prefix = job_data.get('prefix') or ""
+            payload = {
+                "model": target_model,
+                "prompt": prompt,
+                "stream": stream,
+                "keep_alive": WARM_KEEP_ALIVE,
+                "options": self._context_options(job_data, target_model, len(prefix) + len(prompt))
+            }
+
+            # Exact duplicates: answered from cache, or attached to the identical job in flight.
+            # Streamed jobs are never buffered, so they bypass the result cache.
+            cache_key = None
+            cached = None
+            if not stream and job_data.get('cache', True):
+                cache_key = _result_cache_key(target_model, prefix, prompt, payload["options"])
+                cached = self.result_cache.get(cache_key)
+                if cached is None and cache_key in self._inflight:
+                    cached = await asyncio.shield(self._inflight[cache_key])
+
+            if cached is not None:
+                result_payload.update(cached)
+                result_payload["cached"] = True
+                logger.info(f"[CACHE] Job {job_id} served from cache. INTEL SECURED.")
+            else:
+                entry = None
+                waiter = asyncio.get_running_loop().create_future()
+                if cache_key:
+                    self._inflight[cache_key] = waiter
+                try:
+                    ok = await self._generate(payload, job_id, result_payload, prefix)
+                    if ok and cache_key:
+                        entry = {"result": result_payload["result"], "stats": result_payload.get("stats", {})}
+                        self.result_cache.put(cache_key, entry)
+                finally:
+                    if cache_key and self._inflight.get(cache_key) is waiter:
+                        del self._inflight[cache_key]
+                    waiter.set_result(entry)
+                    
         except Exception as e:
             logger.error(f"EXECUTION FAILURE: {e}")
             result_payload["result"] = f"CRITICAL: {str(e)}"
@@ -364,61 +2071,944 @@ class TitanLimb:
             del self.active_jobs[job_id]
             logger.info(f"[JANITOR] Job {job_id} completed in {elapsed:.2f}s")
         
-        self.is_busy = False
         return result_payload
 
+    # --- SANDBOXED EXECUTION (CONTAINER POOL) ---
+    async def execute_sandboxed(self, job_data: dict) -> Dict:
+        """Runs a job's `command` inside a leased sandbox container. Never on the host."""
+        job_id = job_data.get('job_id', 'UNKNOWN')
+        self.active_jobs[job_id] = {"start_time": datetime.now(), "container_id": None}
+        result_payload = {
+            "last_event": "JOB_COMPLETE",
+            "job_id": job_id,
+            "node_id": NODE_ID,
+            "wallet_address": self.wallet,
+            "result": None
+        }
+
+        if self.sandbox is None:
+            logger.warning(f"[SANDBOX] Job {job_id} refused: container mode unavailable")
+            result_payload["result"] = "ERR: SANDBOX UNAVAILABLE"
+        else:
+            command = job_data['command']
+            if isinstance(command, str):
+                command = ["sh", "-c", command]
+            container = await self.sandbox.lease()
+            self.active_jobs[job_id]["container_id"] = container.id
+            logger.info(f"[SANDBOX] Job {job_id} leased {container.short_id}")
+            healthy = True
+            try:
+                exit_code, output = await self.sandbox.run(container, command, self.job_timeout)
+                result_payload["result"] = (output or b"").decode(errors="replace")
+                result_payload["exit_code"] = exit_code
+            except asyncio.CancelledError:
+                # The exec keeps running in its thread; retiring the container kills it
+                healthy = False
+                logger.warning(f"[SANDBOX] Job {job_id} cancelled. Retiring {container.short_id}")
+                raise
+            except Exception as e:
+                healthy = False
+                logger.error(f"[SANDBOX] Job {job_id} failed: {e}")
+                result_payload["result"] = f"CRITICAL: {str(e)}"
+            finally:
+                await self.sandbox.release(container, healthy)
+
+        if job_id in self.active_jobs:
+            elapsed = (datetime.now() - self.active_jobs[job_id]["start_time"]).total_seconds()
+            del self.active_jobs[job_id]
+            logger.info(f"[JANITOR] Job {job_id} completed in {elapsed:.2f}s")
+        return result_payload
+
+    # --- BULK JOBS (EMBED / BATCH_GENERATE) ---
+    def _bulk_items(self, job_data: dict, field: str) -> Optional[list]:
+        """1-BULK_MAX_ITEMS strings (a lone string counts as one), or None."""
+        items = job_data.get(field)
+        if isinstance(items, str):
+            items = [items]
+        if not isinstance(items, list) or not items or len(items) > BULK_MAX_ITEMS:
+            return None
+        if not all(isinstance(item, str) for item in items):
+            return None
+        return items
+
+    @staticmethod
+    def _bulk_int(job_data: dict, field: str, default: int) -> Optional[int]:
+        """A positive integer knob (unset or 0 means `default`), or None when malformed."""
+        try:
+            value = int(job_data.get(field) or default)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return value if value > 0 else None
+
+    def _bulk_progress(self, job_id: str):
+        """A finished item or batch; the janitor times bulk jobs out on idle time, not total runtime."""
+        entry = self.active_jobs.get(job_id)
+        if entry:
+            entry["progress_at"] = datetime.now()
+
+    def _finish_bulk(self, job_id: str, result_payload: dict) -> Dict:
+        if job_id in self.active_jobs:
+            elapsed = (datetime.now() - self.active_jobs[job_id]["start_time"]).total_seconds()
+            del self.active_jobs[job_id]
+            logger.info(f"[JANITOR] Job {job_id} completed in {elapsed:.2f}s")
+        return result_payload
+
+    async def execute_embed(self, job_data: dict) -> Dict:
+        """
+        Embeds job_data['input'] (a string or a list) in batches through the backends'
+        embed endpoint. Each batch streams back as one JOB_CHUNK carrying `offset`,
+        `count`, `dim` and the vectors packed as EMBED_ENCODING; batches may arrive out of order.
+        """
+        job_id = job_data.get('job_id', 'UNKNOWN')
+        model = _canonical_model(job_data.get('model') or EMBED_MODEL)
+        result_payload = {
+            "last_event": "JOB_COMPLETE",
+            "job_id": job_id,
+            "node_id": NODE_ID,
+            "wallet_address": self.wallet,
+            "model": model,
+            "result": None
+        }
+        # Validate everything before the job is tracked; bad input is answered, never raised
+        inputs = self._bulk_items(job_data, 'input')
+        batch_size = self._bulk_int(job_data, 'batch_size', EMBED_BATCH_SIZE)
+        if inputs is None:
+            result_payload["result"] = f"ERR: EMBED NEEDS 1-{BULK_MAX_ITEMS} STRING INPUTS"
+            return result_payload
+        if batch_size is None:
+            result_payload["result"] = "ERR: INVALID BATCH_SIZE"
+            return result_payload
+
+        self.active_jobs[job_id] = {"start_time": datetime.now(), "container_id": None, "model": model}
+        # Embedding models are warmed on their own budget and never routed generation jobs
+        self.models.embed_models.add(model)
+        self.recent_embed_models.append(model)
+        seq = itertools.count()
+        dims = set()
+
+        async def embed_batch(offset: int):
+            texts = inputs[offset:offset + batch_size]
+            vectors = await self._on_backend(model, lambda backend: self._embed_on(backend, model, texts))
+            dim = len(vectors[0]) if vectors else 0
+            dims.add(dim)
+            self._bulk_progress(job_id)
+            await self.outbox.put({
+                "last_event": "JOB_CHUNK",
+                "job_id": job_id,
+                "node_id": NODE_ID,
+                "seq": next(seq),
+                "offset": offset,
+                "count": len(vectors),
+                "dim": dim,
+                "encoding": EMBED_ENCODING,
+                "data": _pack_f32(vectors)
+            })
+
+        start = asyncio.get_running_loop().time()
+        try:
+            offsets = range(0, len(inputs), batch_size)
+            await _run_bounded([functools.partial(embed_batch, o) for o in offsets],
+                               min(BATCH_CONCURRENCY, self.backends.capacity))
+            self.metrics.inc("embed_inputs_total", len(inputs))
+            result_payload.update({
+                "streamed": True,
+                "chunks": len(offsets),
+                "count": len(inputs),
+                "dim": max(dims) if dims else 0,
+                "encoding": EMBED_ENCODING
+            })
+            logger.info(f"[EMBED] Job {job_id}: {len(inputs)} input(s) in {len(offsets)} batch(es) "
+                        f"({asyncio.get_running_loop().time() - start:.2f}s)")
+        except Exception as e:
+            logger.error(f"EXECUTION FAILURE: {e}")
+            result_payload["result"] = f"CRITICAL: {str(e)}"
+        return self._finish_bulk(job_id, result_payload)
+
+    async def _embed_on(self, backend: InferenceBackend, model: str, texts: list) -> list:
+        session = await self._get_session()
+        path, body = backend.embed_request(model, texts)
+        async with session.post(f"{backend.url}{path}", json=body, headers=backend.headers()) as resp:
+            if resp.status != 200:
+                if resp.status >= 500:
+                    backend.record_failure(asyncio.get_running_loop().time())
+                else:
+                    backend.record_success()
+                raise RuntimeError(f"{backend.name} embed HTTP {resp.status}: {await resp.text()}")
+            backend.record_success()
+            vectors = backend.parse_embeddings(await resp.json())
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"{backend.name} returned {len(vectors)} embeddings for {len(texts)} inputs")
+        self.models.mark_loaded(model)
+        return vectors
+
+    async def execute_batch_generate(self, job_data: dict) -> Dict:
+        """
+        Runs job_data['prompts'] as independent generations, `concurrency` at a time
+        (default BATCH_CONCURRENCY). An optional shared `prefix` is prepended to every
+        prompt (raw). Finished items are coalesced into JOB_CHUNK frames with parallel
+        `index` / `results` arrays; failed items carry the usual ERR:/CRITICAL: strings.
+        """
+        job_id = job_data.get('job_id', 'UNKNOWN')
+        model = self.models.resolve(job_data.get('model'))
+        result_payload = {
+            "last_event": "JOB_COMPLETE",
+            "job_id": job_id,
+            "node_id": NODE_ID,
+            "wallet_address": self.wallet,
+            "model": model,
+            "result": None
+        }
+        # Validate everything before the job is tracked; bad input is answered, never raised
+        prompts = self._bulk_items(job_data, 'prompts')
+        concurrency = self._bulk_int(job_data, 'concurrency', BATCH_CONCURRENCY)
+        prefix = job_data.get('prefix') or ""
+        if prompts is None:
+            result_payload["result"] = f"ERR: BATCH NEEDS 1-{BULK_MAX_ITEMS} STRING PROMPTS"
+            return result_payload
+        if concurrency is None:
+            result_payload["result"] = "ERR: INVALID CONCURRENCY"
+            return result_payload
+        if not isinstance(prefix, str):
+            result_payload["result"] = "ERR: INVALID PREFIX"
+            return result_payload
+        try:
+            # One context size for the whole batch so items never make Ollama reload the model
+            options = self._context_options(job_data, model, len(prefix) + max(len(p) for p in prompts))
+        except (TypeError, ValueError, OverflowError):
+            result_payload["result"] = "ERR: INVALID GENERATION OPTIONS"
+            return result_payload
+
+        self.active_jobs[job_id] = {"start_time": datetime.now(), "container_id": None, "model": model}
+        self.recent_models.append(model)
+        use_cache = job_data.get('cache', True)
+        loop = asyncio.get_running_loop()
+        index, results = [], []
+        seq = 0
+        failed = 0
+        last_flush = loop.time()
+
+        async def flush():
+            nonlocal index, results, seq, last_flush
+            if index:
+                await self.outbox.put({
+                    "last_event": "JOB_CHUNK",
+                    "job_id": job_id,
+                    "node_id": NODE_ID,
+                    "seq": seq,
+                    "index": index,
+                    "results": results
+                })
+                seq += 1
+                index, results = [], []
+            last_flush = loop.time()
+
+        async def run_item(i: int):
+            nonlocal failed
+            prompt = prompts[i]
+            item = {"result": None}
+            key = _result_cache_key(model, prefix, prompt, options) if use_cache else None
+            cached = self.result_cache.get(key) if key else None
+            if cached is not None:
+                item.update(cached)
+            else:
+                payload = {"model": model, "prompt": prompt, "stream": False,
+                           "keep_alive": WARM_KEEP_ALIVE, "options": dict(options)}
+                try:
+                    ok = await self._generate(payload, f"{job_id}[{i}]", item, prefix)
+                    if ok and key:
+                        self.result_cache.put(key, {"result": item["result"], "stats": item.get("stats", {})})
+                except Exception as e:
+                    item["result"] = f"CRITICAL: {str(e)}"
+            self._bulk_progress(job_id)
+            text = item["result"] or ""
+            if text.startswith(("ERR:", "CRITICAL:")):
+                failed += 1
+            index.append(i)
+            results.append(text)
+            if len(index) >= BATCH_CHUNK_ITEMS or loop.time() - last_flush >= STREAM_FLUSH_INTERVAL:
+                await flush()
+
+        start = loop.time()
+        try:
+            await _run_bounded([functools.partial(run_item, i) for i in range(len(prompts))],
+                               min(concurrency, self.backends.capacity))
+            await flush()
+            self.metrics.inc("batch_items_total", len(prompts))
+            result_payload.update({"streamed": True, "chunks": seq, "count": len(prompts), "failed": failed})
+            logger.info(f"[BATCH] Job {job_id}: {len(prompts)} prompt(s), {failed} failed ({loop.time() - start:.2f}s)")
+        except Exception as e:
+            logger.error(f"EXECUTION FAILURE: {e}")
+            result_payload["result"] = f"CRITICAL: {str(e)}"
+        return self._finish_bulk(job_id, result_payload)
+
+    async def _generate(self, payload: dict, job_id: str, result_payload: dict, prefix: str = "") -> bool:
+        """Runs one generation on the least-loaded usable backend. Returns True on success."""
+        try:
+            return await self._on_backend(
+                payload["model"], lambda backend: self._generate_on(backend, dict(payload), job_id, result_payload, prefix)
+            )
+        except NoBackendAvailable as e:
+            logger.error(f"[BACKEND] {e}")
+            result_payload["result"] = "ERR: NO INFERENCE BACKEND AVAILABLE"
+            return False
+
+    async def _on_backend(self, model: str, call):
+        """
+        Awaits `call(backend)` on the least-loaded usable backend serving `model`.
+        A backend that cannot be reached at all counts against its circuit and the
+        call fails over to the next one; failures after the request was accepted are not retried.
+        """
+        tried = []
+        while True:
+            backend = self.backends.acquire(model, exclude=tried)
+            if backend is None:
+                raise NoBackendAvailable(f"No usable backend for {model} ({len(tried)} tried)")
+            tried.append(backend)
+            try:
+                return await call(backend)
+            except aiohttp.ClientConnectorError as e:
+                backend.record_failure(asyncio.get_running_loop().time())
+                logger.warning(f"[BACKEND] {backend.name} unreachable ({e}). Failing over.")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                backend.record_failure(asyncio.get_running_loop().time())
+                raise
+            finally:
+                self.backends.release(backend)
+
+    async def _generate_on(self, backend: InferenceBackend, payload: dict, job_id: str, result_payload: dict, prefix: str) -> bool:
+        """Runs one generate call on `backend` over the pooled session."""
+        model = payload["model"]
+        if prefix:
+            # Shared prefix: a raw completion of prefix + prompt. Templated, the prefix would become
+            # a finished user turn. Repeats of the prefix are served from the backend's KV cache.
+            payload["raw"] = True
+            payload["prompt"] = prefix + payload["prompt"]
+
+        session = await self._get_session()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        path, body = backend.generate_request(payload)
+        async with session.post(f"{backend.url}{path}", json=body, headers=backend.headers()) as resp:
+            if resp.status != 200:
+                err_msg = await resp.text()
+                logger.error(f"[BACKEND] {backend.name} ERROR {resp.status}: {err_msg}")
+                if resp.status >= 500:
+                    backend.record_failure(loop.time())
+                else:
+                    backend.record_success()  # the server is up; the request was bad
+                result_payload["result"] = f"ERR: NEURAL ENGINE FAILURE {resp.status}"
+                return False
+
+            backend.record_success()
+            result_payload["backend"] = backend.name
+            try:
+                if payload["stream"]:
+                    data = await self._relay_stream(backend, resp, job_id, result_payload, start)
+                else:
+                    data = backend.parse_response(await resp.json())
+                    result_payload["result"] = data.get("response", "")
+                    # Unstreamed: first token lands after load + prompt evaluation
+                    if "prompt_eval_duration" in data:
+                        self.metrics.observe("ttft_seconds", (data.get("load_duration", 0) + data["prompt_eval_duration"]) / 1e9)
+            except asyncio.CancelledError:
+                # Drop the socket (never back to the pool) so Ollama stops generating
+                resp.close()
+                logger.warning(f"[SCHEDULER] Job {job_id} aborted mid-generation")
+                raise
+            result_payload["stats"] = {k: data[k] for k in OLLAMA_STAT_FIELDS if k in data}
+            self.models.mark_loaded(model)
+            if not backend.holds(model):
+                backend.loaded.append(backend.model_id(model))
+            if backend.supports_keep_alive:
+                self.ctx_planner.loaded_with(model, payload["options"]["num_ctx"])
+            self.ctx_planner.observe(model, len(payload["prompt"]), data.get("prompt_eval_count"))
+            duration = loop.time() - start
+            self.metrics.observe("generation_seconds", duration)
+            if data.get("eval_count") and data.get("eval_duration"):
+                self.metrics.observe("tokens_per_second", data["eval_count"] / (data["eval_duration"] / 1e9))
+            logger.info(f"MISSION SUCCESS ({duration:.2f}s). INTEL SECURED.")
+            return True
+
+    # --- STREAMING RELAY (NDJSON -> JOB_CHUNK) ---
+    async def _relay_stream(self, backend: InferenceBackend, resp, job_id: str, result_payload: dict, start: float) -> Dict:
+        """
+        Forwards the backend's token stream to the dispatcher as JOB_CHUNK frames.
+        Text is never accumulated beyond one coalescing window. Returns the final
+        Ollama object (the one carrying eval_count and durations).
+        """
+        loop = asyncio.get_running_loop()
+        buffer = []
+        buffered = 0
+        seq = 0
+        last_flush = float("-inf")  # first token goes out immediately
+        final = {}
+
+        async def flush():
+            nonlocal buffer, buffered, seq, last_flush
+            if buffer:
+                await self.outbox.put({
+                    "last_event": "JOB_CHUNK",
+                    "job_id": job_id,
+                    "node_id": NODE_ID,
+                    "seq": seq,
+                    "delta": "".join(buffer)
+                })
+                seq += 1
+                buffer, buffered = [], 0
+            last_flush = loop.time()
+
+        async for chunk in backend.iter_chunks(resp):
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+
+            token = chunk.get("response", "")
+            if token:
+                if seq == 0 and not buffer:
+                    self.metrics.observe("ttft_seconds", loop.time() - start)
+                buffer.append(token)
+                buffered += len(token)
+
+            if chunk.get("done"):
+                final = chunk
+                break
+            if buffered >= STREAM_CHUNK_CHARS or loop.time() - last_flush >= STREAM_FLUSH_INTERVAL:
+                await flush()
+
+        await flush()
+        # Final frame: text already delivered as chunks; seq tells the dispatcher how many to expect
+        result_payload["streamed"] = True
+        result_payload["chunks"] = seq
+        return final
+
+    # --- THERMAL GOVERNOR (ADMISSION / OPTIONS) ---
+    def _context_options(self, job_data: dict, model: str, prompt_chars: int) -> Dict:
+        """Sizes num_ctx for the prompt plus the job's output budget, then applies the thermal batch limit."""
+        options = {"temperature": 0.7}
+        num_predict = job_data.get('num_predict', job_data.get('max_tokens'))
+        if num_predict is not None:
+            options["num_predict"] = int(num_predict)
+        reserve = options["num_predict"] if options.get("num_predict", -1) > 0 else DEFAULT_NUM_PREDICT
+        needed = self.ctx_planner.estimate_tokens(model, prompt_chars) + PROMPT_TEMPLATE_TOKENS + reserve
+
+        if job_data.get('num_ctx'):
+            options["num_ctx"] = int(job_data['num_ctx'])  # explicit request wins
+        else:
+            options["num_ctx"] = self.ctx_planner.plan(model, needed, model in self.models.loaded)
+            if needed > NUM_CTX_TIERS[-1]:
+                logger.warning(f"[CTX] ~{needed} tokens exceed the {NUM_CTX_TIERS[-1]} ctx cap; prompt may be truncated")
+        return self._thermal_options(options)
+
+    def _thermal_options(self, options: dict) -> Dict:
+        """Shrinks the prefill batch while the governor is throttling; num_ctx stays at the planned size."""
+        scale = self.governor.batch_scale
+        if scale < 1.0:
+            options["num_batch"] = max(128, int(options.get("num_batch", DEFAULT_NUM_BATCH) * scale))
+        return options
+
+    def _over_thermal_budget(self) -> bool:
+        """Cooldown refuses everything; throttled nodes stop queueing past their reduced capacity."""
+        if self.governor.cooldown:
+            return True
+        return self.governor.throttled and self.job_queue.qsize() >= self.governor.allowed
+
+    # --- JOB SCHEDULER (BOUNDED CONCURRENCY) ---
+    @staticmethod
+    def _job_priority(job: dict) -> Optional[int]:
+        """The job's integer priority (default 0), or None when the field is malformed."""
+        try:
+            return int(job.get("priority") or 0)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    @staticmethod
+    def _streams_output(job: dict) -> bool:
+        """Jobs that send JOB_CHUNK frames as they run; a rerun would repeat them from seq 0."""
+        return bool(job.get('stream', STREAM_RESULTS)) or job.get('type') in ('embed', 'batch_generate')
+
+    def _enqueue_job(self, job: dict, priority: int = 0) -> bool:
+        """Admits a job into the local queue. Returns False when the queue is full."""
+        try:
+            self.job_queue.put_nowait((-priority, next(self._job_seq), job))
+        except asyncio.QueueFull:
+            logger.warning(f"[SCHEDULER] Queue full ({self.job_queue.qsize()}). Rejecting job {job.get('job_id')}")
+            return False
+        logger.info(f"[SCHEDULER] Job {job.get('job_id')} queued ({self.job_queue.qsize()} waiting)")
+        if self.journal and self.dispatcher_acks:
+            self.journal.accepted(job.get("job_id"))
+        self._enqueued_at[job.get("job_id")] = asyncio.get_running_loop().time()
+        self._preempt_for(priority)
+        return True
+
+    def _preempt_for(self, priority: int):
+        """
+        Frees a slot for `priority` by preempting the newest lowest-priority running job.
+        Jobs already streaming output to the dispatcher are never preempted.
+        """
+        preempting = sum(1 for reason in self._cancel_reasons.values() if reason == "PREEMPTED")
+        if self.active_job_count - preempting < self.governor.allowed:
+            return
+        victims = [(entry[0], entry[1], job_id) for job_id, entry in self._running.items()
+                   if -entry[0] < priority and job_id not in self._cancel_reasons
+                   and not self._streams_output(entry[2])]
+        if victims:
+            _, _, job_id = max(victims)  # lowest priority, then least work sunk into it
+            logger.warning(f"[SCHEDULER] Preempting job {job_id} for priority {priority} work")
+            self.cancel_job(job_id, "PREEMPTED")
+
+    def cancel_job(self, job_id: str, reason: str = "CANCELLED") -> bool:
+        """Cancels a queued or running job. Returns False if the job is unknown here."""
+        task = self.job_tasks.get(job_id)
+        if task is not None:
+            if job_id not in self._cancel_reasons:
+                self._cancel_reasons[job_id] = reason
+                task.cancel()
+            return True
+        if job_id in self._enqueued_at and job_id not in self._cancelled_queued:
+            self._cancelled_queued.add(job_id)  # dropped by the scheduler when dequeued
+            self._report_cancelled(job_id, reason)
+            return True
+        return job_id in self._cancelled_queued
+
+    def _report_cancelled(self, job_id: str, reason: str):
+        self.metrics.inc("jobs_cancelled_total")
+        if self.journal:
+            self.journal.acked(job_id)  # nothing left to deliver
+        self.outbox.put_nowait({
+            "last_event": "JOB_CANCELLED",
+            "job_id": job_id,
+            "node_id": NODE_ID,
+            "wallet_address": self.wallet,
+            "reason": reason
+        })
+
+    def _journal_result(self, result: dict):
+        """
+        Journals a finished job for replay until the dispatcher acks it. Streamed and bulk
+        results are not journaled: their text already left as JOB_CHUNK frames.
+        """
+        if not self.journal:
+            return
+        if self.dispatcher_acks and not result.get("streamed"):
+            self.journal.completed(result)
+        else:
+            self.journal.acked(result["job_id"])  # closes a journaled accept; nothing to replay
+
+    async def _scheduler_loop(self):
+        """Launches one background task per job, bounded by the governor's allowance. Highest priority first."""
+        while True:
+            # Wait for a slot before dequeuing so the best job at that moment gets it
+            async with self._capacity:
+                await self._capacity.wait_for(lambda: self.active_job_count < self.governor.allowed)
+            entry = await self.job_queue.get()
+            job = entry[2]
+            job_id = job.get("job_id", "UNKNOWN")
+            enqueued_at = self._enqueued_at.pop(job_id, None)
+            if job_id in self._cancelled_queued:
+                self._cancelled_queued.discard(job_id)
+                self.job_queue.task_done()
+                logger.info(f"[SCHEDULER] Job {job_id} cancelled before it started")
+                continue
+            if enqueued_at is not None:
+                self.metrics.observe("queue_wait_seconds", asyncio.get_running_loop().time() - enqueued_at)
+            self._running[job_id] = entry
+            self.job_tasks[job_id] = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: dict):
+        job_id = job.get("job_id", "UNKNOWN")
+        try:
+            result = await self.execute_task(job)
+            self.metrics.inc("jobs_total")
+            if str(result.get("result") or "").startswith(("ERR:", "CRITICAL:")):
+                self.metrics.inc("jobs_failed_total")
+            self._journal_result(result)
+            await self.outbox.put(result)
+        except asyncio.CancelledError:
+            reason = self._cancel_reasons.pop(job_id, None)
+            if reason is None:
+                raise  # shutdown
+            self.active_jobs.pop(job_id, None)
+            entry = self._running.get(job_id)
+            if reason == "PREEMPTED" and entry is not None:
+                self.metrics.inc("jobs_preempted_total")
+                try:
+                    # Back in line at its original position; reruns once the priority work is done
+                    self.job_queue.put_nowait(entry)
+                    self._enqueued_at[job_id] = asyncio.get_running_loop().time()
+                    logger.info(f"[SCHEDULER] Job {job_id} preempted and requeued")
+                    return
+                except asyncio.QueueFull:
+                    pass
+            logger.info(f"[SCHEDULER] Job {job_id} cancelled ({reason})")
+            self._report_cancelled(job_id, reason)
+        except Exception as e:
+            # Never leave the dispatcher waiting on a job that died outside execute_task's own handling
+            logger.error(f"[SCHEDULER] Job {job_id} crashed: {e}")
+            self.active_jobs.pop(job_id, None)
+            self.metrics.inc("jobs_total")
+            self.metrics.inc("jobs_failed_total")
+            result = {
+                "last_event": "JOB_COMPLETE",
+                "job_id": job_id,
+                "node_id": NODE_ID,
+                "wallet_address": self.wallet,
+                "result": f"CRITICAL: {str(e)}"
+            }
+            self._journal_result(result)
+            await self.outbox.put(result)
+        finally:
+            self.job_tasks.pop(job_id, None)
+            self._running.pop(job_id, None)
+            self.job_queue.task_done()
+            async with self._capacity:
+                self._capacity.notify_all()
+
+    # --- HEARTBEAT PROTOCOL (NEGOTIATION / DELTA / ENCODING) ---
+    def _reset_protocol(self):
+        self.heartbeat_mode = "full"
+        self.wire_encoding = "json"
+        self._hb_seq = 0
+        self._hb_last = None
+
+    def _protocol_offer(self) -> Dict:
+        return {"heartbeat": HEARTBEAT_MODES, "encoding": WIRE_ENCODINGS, "keyframe_every": HEARTBEAT_KEYFRAME_EVERY,
+                "acks": JOURNAL_ENABLED}
+
+    def _apply_protocol(self, request: dict) -> Dict:
+        """Adopts the dispatcher's choice where supported. Returns the ack describing what is in force."""
+        if request.get("heartbeat") in HEARTBEAT_MODES:
+            self.heartbeat_mode = request["heartbeat"]
+            self._hb_last = None  # next heartbeat is a keyframe
+        if request.get("encoding") in WIRE_ENCODINGS:
+            self.wire_encoding = request["encoding"]
+        if "acks" in request:
+            self.dispatcher_acks = JOURNAL_ENABLED and bool(request["acks"])
+        logger.info(f"[PROTOCOL] Heartbeat: {self.heartbeat_mode.upper()}, encoding: {self.wire_encoding.upper()}, "
+                    f"acks: {'ON' if self.dispatcher_acks else 'OFF'}")
+        return {"type": "protocol_ack", "heartbeat": self.heartbeat_mode, "encoding": self.wire_encoding,
+                "acks": self.dispatcher_acks}
+
+    # --- SESSION RESUME ---
+    def _store_resume(self, msg: dict):
+        """Keeps the dispatcher's resume token for a fast re-registration after a short drop."""
+        token = msg.get("resume_token")
+        if not token or not isinstance(token, str):
+            return
+        try:
+            ttl = float(msg.get("ttl") or RESUME_MAX_TTL)
+        except (TypeError, ValueError, OverflowError):
+            ttl = None
+        # NaN fails both comparisons; inf is clamped below
+        if ttl is None or not ttl > 0:
+            logger.warning(f"[UPLINK] Ignoring resume token with invalid ttl {msg.get('ttl')!r}")
+            return
+        ttl = min(ttl, RESUME_MAX_TTL)
+        self.resume = {"token": token, "expires": asyncio.get_running_loop().time() + ttl}
+
+    def _resume_token(self) -> Optional[str]:
+        if self.resume and asyncio.get_running_loop().time() < self.resume["expires"]:
+            return self.resume["token"]
+        self.resume = None
+        return None
+
+    def _next_reconnect_delay(self, connected_at: Optional[float]) -> float:
+        """Decorrelated jittered backoff (grows ~3x per failure, never in lockstep)."""
+        # A link that held for a while starts the backoff over
+        if connected_at is not None and asyncio.get_running_loop().time() - connected_at >= RECONNECT_STABLE_AFTER:
+            self.reconnect_delay = RECONNECT_BASE_DELAY
+        self.reconnect_delay = min(RECONNECT_MAX_DELAY, random.uniform(RECONNECT_BASE_DELAY, self.reconnect_delay * 3))
+        return self.reconnect_delay
+
+    def _connect_args(self) -> Dict:
+        """Websocket connect kwargs; built once, the library version does not change at runtime."""
+        # Polymorphic Header Fix (Robustness against library updates)
+        connect_args = {"uri": self.uri}
+        try:
+            import websockets.version
+            ver = int(websockets.version.version.split('.')[0])
+            if ver >= 14: connect_args["additional_headers"] = self.headers
+            else: connect_args["extra_headers"] = self.headers
+        except: connect_args["extra_headers"] = self.headers
+        # permessage-deflate: heartbeats are small and repetitive, they compress well
+        connect_args["compression"] = "deflate" if WS_COMPRESSION else None
+        # Dead-link detection: the library pings and closes the link if no pong comes back
+        connect_args["ping_interval"] = WS_PING_INTERVAL or None
+        connect_args["ping_timeout"] = WS_PING_TIMEOUT or None
+        return connect_args
+
+    def _heartbeat_frame(self, telemetry: dict) -> Dict:
+        """Full telemetry in legacy mode; otherwise a sequenced delta against the last heartbeat."""
+        if self.heartbeat_mode != "delta":
+            return telemetry
+        state = {k: v for k, v in telemetry.items() if k not in STATIC_TELEMETRY_FIELDS}
+        self._hb_seq += 1
+        frame = {"type": "hb", "seq": self._hb_seq}
+        if self._hb_last is None or self._hb_seq % HEARTBEAT_KEYFRAME_EVERY == 0:
+            frame["kf"] = True
+            frame["d"] = state
+        else:
+            frame["d"] = _dict_delta(self._hb_last, state)
+        self._hb_last = state
+        return frame
+
+    def _encode(self, msg: dict):
+        if self.wire_encoding == "msgpack":
+            return msgpack.packb(msg, use_bin_type=True)
+        return json.dumps(msg)
+
+    def _decode(self, raw) -> Optional[dict]:
+        try:
+            if isinstance(raw, bytes) and msgpack is not None:
+                return msgpack.unpackb(raw, raw=False)
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    # --- UPLINK TASKS (SENDER / HEARTBEAT / RECEIVER) ---
+    async def _sender_loop(self, ws):
+        """Sole writer on the websocket. Drains the outbox in order."""
+        while True:
+            msg = await self.outbox.get()
+            try:
+                sent_at = asyncio.get_running_loop().time()
+                await ws.send(self._encode(msg))
+                if not msg.get("job_id"):
+                    self.metrics.observe("heartbeat_send_seconds", asyncio.get_running_loop().time() - sent_at)
+            except Exception:
+                # Keep job results for the next uplink; heartbeats are disposable.
+                if msg.get("job_id"):
+                    self.outbox.put_nowait(msg)
+                raise
+
+    def _purge_outbox(self):
+        """
+        Drops heartbeats and acks left over from a dead uplink; job frames are kept.
+        Journaled results are dropped too: _replay_journal resends them on the next uplink.
+        """
+        kept = []
+        while not self.outbox.empty():
+            msg = self.outbox.get_nowait()
+            journaled = self.journal and msg.get("last_event") == "JOB_COMPLETE" and msg.get("job_id") in self.journal.unacked
+            if msg.get("job_id") and not journaled:
+                kept.append(msg)
+        for msg in kept:
+            self.outbox.put_nowait(msg)
+
+    async def _replay_journal(self):
+        """
+        Resends every finished-but-unacknowledged result after a (re)connect. A dispatcher
+        that has not negotiated acks gets each one once more and the journal forgets it.
+        """
+        if not self.journal:
+            return
+        undelivered = self.journal.undelivered()
+        if undelivered:
+            logger.info(f"[JOURNAL] Replaying {len(undelivered)} undelivered result(s)")
+        for result in undelivered:
+            await self.outbox.put({**result, "replay": True})
+            if not self.dispatcher_acks:
+                self.journal.acked(result["job_id"])
+
+    async def _heartbeat_loop(self):
+        while True:
+            telemetry = await self.get_telemetry(self.jetson)
+            await self.outbox.put(self._heartbeat_frame(telemetry))
+            heartbeat_logger.info(f"HEARTBEAT: {telemetry['status']} | slots {telemetry['slots']['active']}/"
+                                  f"{telemetry['slots']['max']} | {telemetry['specs']['gpu_temp']}°C")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def _receive_loop(self, ws):
+        while True:
+            job = self._decode(await ws.recv())
+            if not isinstance(job, dict):
+                continue
+
+            if job.get("type") == "protocol":
+                await self.outbox.put(self._apply_protocol(job))
+
+            # Dispatcher issues (or refreshes) the session resume token
+            elif job.get("type") == "session":
+                self._store_resume(job)
+
+            # Resume refused (token expired dispatcher-side): drop the link and register in full
+            elif job.get("type") == "resume_rejected":
+                logger.warning("[UPLINK] Session resume rejected. Re-registering.")
+                self.resume = None
+                self.reconnect_delay = RECONNECT_BASE_DELAY
+                await ws.close()
+                return
+
+            # Dispatcher withdraws work it no longer needs
+            elif str(job.get("type", "")).lower() == "cancel":
+                for job_id in job.get("job_ids") or [job.get("job_id")]:
+                    if not self.cancel_job(job_id):
+                        logger.info(f"[SCHEDULER] Cancel for unknown job {job_id} ignored")
+
+            # Dispatcher confirms receipt; trim the journal
+            elif job.get("type") == "ack":
+                if self.journal:
+                    for job_id in job.get("job_ids") or [job.get("job_id")]:
+                        self.journal.acked(job_id)
+
+            # Valid Job Received
+            elif job.get("job_id"):
+                priority = self._job_priority(job)
+                if priority is None:
+                    logger.warning(f"[SCHEDULER] Rejecting job {job.get('job_id')}: invalid priority {job.get('priority')!r}")
+                    await self.outbox.put({
+                        "last_event": "JOB_REJECTED",
+                        "job_id": job.get("job_id"),
+                        "node_id": NODE_ID,
+                        "wallet_address": self.wallet,
+                        "reason": "INVALID_PRIORITY"
+                    })
+                elif self._over_thermal_budget():
+                    logger.warning(f"[GOVERNOR] Deferring job {job.get('job_id')} (over thermal budget)")
+                    await self.outbox.put({
+                        "last_event": "JOB_DEFERRED",
+                        "job_id": job.get("job_id"),
+                        "node_id": NODE_ID,
+                        "wallet_address": self.wallet,
+                        "reason": "THERMAL",
+                        "retry_after": GOVERNOR_RETRY_AFTER
+                    })
+                elif self._enqueue_job(job, priority):
+                    # Acknowledge Receipt (telemetry tagged with the accepted job)
+                    ack = self._heartbeat_frame(await self.get_telemetry(self.jetson))
+                    ack["ack"] = job.get("job_id")
+                    await self.outbox.put(ack)
+                else:
+                    await self.outbox.put({
+                        "last_event": "JOB_REJECTED",
+                        "job_id": job.get("job_id"),
+                        "node_id": NODE_ID,
+                        "wallet_address": self.wallet,
+                        "reason": "QUEUE_FULL"
+                    })
+
+    # --- METRICS ENDPOINT ---
+    async def _start_metrics_server(self) -> Optional[web.AppRunner]:
+        """Serves GET /metrics on METRICS_HOST:METRICS_PORT when enabled."""
+        if not METRICS_PORT:
+            return None
+
+        async def handle_metrics(request):
+            return web.Response(text=self.metrics.render_prometheus(), content_type="text/plain")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+        logger.info(f"[METRICS] Serving http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        return runner
+
     # --- MAIN COMMAND LOOP ---
     async def run(self):
+        loop = asyncio.get_running_loop()
         # Activate Hardware Monitor
         jetson = None
         if IS_JETSON:
-            try: jetson = jtop(); jetson.start()
+            try:
+                from jtop import jtop  # Telemetry degrades gracefully if missing
+                jetson = jtop(); jetson.start()
             except: pass
+        self.jetson = jetson
+
+        # Blocking setup runs off the loop: cached hardware profile, docker, journal replay
+        self.hardware = await loop.run_in_executor(self.executor, load_hardware_profile)
+        sensors = self.hardware.get("linux_sensors")
+        if sensors:
+            self._linux_sensors = (sensors["temps"], [(tuple(paths), scale) for paths, scale in sensors["power"]])
+        if self.container_mode:
+            self.docker_client = await loop.run_in_executor(self.executor, _connect_docker)
+            if self.docker_client:
+                self.sandbox = SandboxPool(self.docker_client, max_jobs=self.max_concurrency)
+        if JOURNAL_ENABLED and self.journal is None:
+            self.journal = await loop.run_in_executor(self.executor, JobJournal, JOURNAL_PATH)
 
         logger.info(f"TITAN LIMB ONLINE. ID: {NODE_ID}")
+        # Populate the model inventory before the handshake advertises it
+        await self._verify_ollama_link()
+        metrics_runner = await self._start_metrics_server()
+        background = [
+            asyncio.create_task(self._janitor_loop()),
+            asyncio.create_task(self._telemetry_loop()),
+            asyncio.create_task(self._scheduler_loop()),
+            asyncio.create_task(self._model_refresh_loop()),
+            asyncio.create_task(self._warm_keeper_loop()),
+        ]
+        if self.sandbox:
+            background.append(asyncio.create_task(self.sandbox.maintain_loop()))
         
+        try:
+            await self._uplink_loop()
+        finally:
+            for task in background:
+                task.cancel()
+            if self.sandbox:
+                await self.sandbox.close()
+            if self.journal:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.journal.close)
+            if metrics_runner:
+                await metrics_runner.cleanup()
+            await self.close()
+
+    async def _uplink_loop(self):
+        connect_args = self._connect_args()
         while True:
+            connected_at = None
             try:
-                # Polymorphic Header Fix (Robustness against library updates)
-                connect_args = {"uri": self.uri}
-                try:
-                    import websockets.version
-                    ver = int(websockets.version.version.split('.')[0])
-                    if ver >= 14: connect_args["additional_headers"] = self.headers
-                    else: connect_args["extra_headers"] = self.headers
-                except: connect_args["extra_headers"] = self.headers
-
                 logger.info(f"ESTABLISHING UPLINK: {self.uri}")
                 async with websockets.connect(**connect_args) as ws:
                     logger.info("UPLINK SECURE. AWAITING DIRECTIVES.")
+                    connected_at = asyncio.get_running_loop().time()
+                    resume_token = self._resume_token()
                     # --- START HANDSHAKE INJECTION ---
-                    try:
-                        import platform as _platform
-                        handshake_payload = {
-                            "type": "handshake",
-                            "model": "NVIDIA Jetson Orin NX (16GB)",
-                            "arch": _platform.machine(),
-                            "status": "online",
-                            "version": "1.0.2"
-                        }
-                        await ws.send(json.dumps(handshake_payload))
-                        print(f"[>>] SENT HANDSHAKE: {handshake_payload}")
-                    except Exception as e:
-                        print(f"[!!] HANDSHAKE FAILED: {e}")
+                    # (skipped on resume: the dispatcher still holds our registration)
+                    if not resume_token:
+                        try:
+                            import platform as _platform
+                            handshake_payload = {
+                                "type": "handshake",
+                                "model": "NVIDIA Jetson Orin NX (16GB)",
+                                "arch": _platform.machine(),
+                                "status": "online",
+                                "version": "1.0.2"
+                            }
+                            await ws.send(json.dumps(handshake_payload))
+                            logger.info(f"[>>] SENT HANDSHAKE: {handshake_payload}")
+                        except Exception as e:
+                            logger.error(f"[!!] HANDSHAKE FAILED: {e}")
                     # --- END HANDSHAKE INJECTION ---
                     self.reconnect_attempts = 0
+                    self.online = True
+                    self._reset_protocol()
                     
                     # Handshake / Challenge-Response
                     try:
                         # Wait for server challenge (or initial prompt). The
                         # dispatcher will send a JSON payload like {"challenge": "..."}
                         raw = await ws.recv()
-                        try:
-                            incoming = json.loads(raw)
-                        except Exception:
+                        incoming = self._decode(raw)
+                        if not isinstance(incoming, dict):
                             incoming = {}
 
-                        if incoming.get("challenge"):
+                        if resume_token:
+                            # Fast path: authenticate and reclaim the session, skip re-registration
+                            nonce = incoming.get("challenge")
+                            resume = {
+                                "type": "resume",
+                                "resume_token": resume_token,
+                                "node_id": NODE_ID,
+                                "wallet_address": self.wallet,
+                                "protocol": self._protocol_offer(),
+                                "last_event": "RESUME"
+                            }
+                            if nonce:
+                                resume["challenge_resp"] = hmac.new(GENESIS_KEY.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+                            await ws.send(json.dumps(resume))
+                            logger.info("[UPLINK] Resuming session (registration skipped)")
+                        elif incoming.get("challenge"):
                             nonce = incoming.get("challenge")
                             resp = hmac.new(GENESIS_KEY.encode(), nonce.encode(), hashlib.sha256).hexdigest()
                             # Include explicit handshake metadata so the dispatcher
@@ -433,6 +3023,8 @@ class TitanLimb:
                                 "cores": 8,
                                 "ram": "16GB",
                                 "wallet_address": self.wallet,
+                                "models": self.models.snapshot(),
+                                "protocol": self._protocol_offer(),
                                 "last_event": "HANDSHAKE"
                             }
                             await ws.send(json.dumps(handshake))
@@ -440,50 +3032,60 @@ class TitanLimb:
                             # Fallback: send telemetry as handshake if server didn't issue a challenge
                             # Send a clearly labelled handshake payload so the
                             # dispatcher stores a human-friendly model string.
-                            init = await self.get_telemetry(jetson)
+                            init = await self.get_telemetry(self.jetson)
                             init["type"] = "handshake"
                             init["model"] = "NVIDIA Jetson Orin"
                             init["node_id"] = NODE_ID
                             init["arch"] = platform.machine()
                             init["cores"] = 8
                             init["ram"] = "16GB"
+                            init["models"] = self.models.snapshot()
+                            init["protocol"] = self._protocol_offer()
                             init["last_event"] = "HANDSHAKE"
-                            print(f"Sending Specs: {init}")
+                            logger.info(f"Sending Specs: {init}")
                             await ws.send(json.dumps(init))
+                        # The challenge may carry the protocol choice and a resume token up front
+                        if isinstance(incoming.get("protocol"), dict):
+                            await self.outbox.put(self._apply_protocol(incoming["protocol"]))
+                        self._store_resume(incoming)
                     except Exception as e:
                         logger.warning(f"HANDSHAKE ERROR: {e}")
 
-                    while True:
-                        # 1. Heartbeat Report
-                        telemetry = await self.get_telemetry(jetson)
-                        await ws.send(json.dumps(telemetry))
-                        
-                        # 2. Receive Orders
-                        try:
-                            msg = await asyncio.wait_for(ws.recv(), timeout=HEARTBEAT_INTERVAL)
-                            job = json.loads(msg)
-                            
-                            # Valid Job Received
-                            if job.get("job_id"):
-                                # Acknowledge Receipt
-                                self.is_busy = True
-                                await ws.send(json.dumps(await self.get_telemetry(jetson)))
-                                
-                                # Execute
-                                result = await self.execute_task(job)
-                                
-                                # Transmit Intel
-                                await ws.send(json.dumps(result))
-                                
-                        except asyncio.TimeoutError: pass # Just a heartbeat cycle
-                        except websockets.exceptions.ConnectionClosed:
-                            logger.warning("UPLINK SEVERED. RECONNECTING...")
-                            break
+                    await self._replay_journal()
+
+                    # Heartbeats, orders and results run as independent tasks so a
+                    # long generation never stalls the uplink. Jobs outlive the
+                    # connection; their results wait in the outbox for the next one.
+                    uplink = [
+                        asyncio.create_task(self._sender_loop(ws)),
+                        asyncio.create_task(self._heartbeat_loop()),
+                        asyncio.create_task(self._receive_loop(ws)),
+                    ]
+                    try:
+                        done, _ = await asyncio.wait(uplink, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        self.online = False
+                        for task in uplink:
+                            task.cancel()
+                        await asyncio.gather(*uplink, return_exceptions=True)
+                        self._purge_outbox()
+
+                    for task in done:
+                        exc = task.exception()
+                        if isinstance(exc, websockets.exceptions.ConnectionClosed):
+                            logger.warning(f"UPLINK SEVERED ({exc.__class__.__name__}). RECONNECTING...")
+                        elif exc:
+                            raise exc
+
+                delay = self._next_reconnect_delay(connected_at)
+                self.metrics.inc("reconnects_total")
+                await asyncio.sleep(delay)
             
             except Exception as e:
                 self.reconnect_attempts += 1
-                delay = min(RECONNECT_DELAY * self.reconnect_attempts, 60)
-                logger.error(f"LINK ERROR: {e}. Retrying in {delay}s...")
+                delay = self._next_reconnect_delay(connected_at)
+                logger.error(f"LINK ERROR: {e}. Retrying in {delay:.1f}s...")
+                self.metrics.inc("reconnects_total")
                 await asyncio.sleep(delay)
 
 if __name__ == "__main__":
@@ -492,7 +3094,10 @@ if __name__ == "__main__":
     parser = _argparse.ArgumentParser(description="Titan Limb Worker")
     parser.add_argument("--connect", help="WebSocket connect URL", default=os.getenv("WEBSOCKET_URL", "ws://127.0.0.1:8000/connect"))
     parser.add_argument("--config", help="Path to config file", default=os.path.expanduser("~/.si64/config.json"))
+    parser.add_argument("--concurrency", type=int, help=f"Max concurrent jobs (default: backend capacity, {MAX_CONCURRENT_JOBS})")
+    parser.add_argument("--backend", action="append", help="Inference backend '[kind=]url[#parallel]' (repeatable)")
     args = parser.parse_args()
+    LOG_WRITER = setup_logging(LOG_DIR)
 
     # Update Configuration Variables
     BRAIN_URL = args.connect
@@ -502,7 +3107,7 @@ if __name__ == "__main__":
     logger.info(f"[CLI] UPLINK: {BRAIN_URL}")
     logger.info(f"[CLI] CONFIG: {CONFIG_FILE}")
 
-    node = TitanLimb(connect_url=BRAIN_URL)
+    node = TitanLimb(connect_url=BRAIN_URL, max_concurrency=args.concurrency, backends=args.backend)
     try:
         asyncio.run(node.run())
     except KeyboardInterrupt:
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "core", "limb"))
+
+# The limb reads its identity from the environment at construction time
+os.environ.setdefault("SI64_WALLET_ADDRESS", "TEST_WALLET")
+os.environ.setdefault("GENESIS_KEY", "test-key")
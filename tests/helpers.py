@@ -0,0 +1,47 @@
+"""Shared fixtures-by-hand for the limb tests: a limb factory, in-process HTTP servers, fake sockets."""
+import json
+
+from aiohttp import web
+
+import worker_node as wn
+
+
+def make_limb(**kwargs):
+    """A TitanLimb pointed at unreachable endpoints. Build it inside the test's event loop."""
+    kwargs.setdefault("connect_url", "ws://127.0.0.1:1/connect")
+    kwargs.setdefault("backends", ["ollama=http://127.0.0.1:9#2"])
+    return wn.TitanLimb(**kwargs)
+
+
+async def serve(routes):
+    """Starts an in-process HTTP server for `routes` [(method, path, handler)]. Returns (runner, url)."""
+    app = web.Application()
+    for method, path, handler in routes:
+        app.router.add_route(method, path, handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+class FakeSocket:
+    """Feeds `frames` to _receive_loop, then drops the link."""
+
+    def __init__(self, frames):
+        self.frames = [json.dumps(f) for f in frames]
+        self.closed = False
+
+    async def recv(self):
+        if not self.frames:
+            raise EOFError
+        return self.frames.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def drain(q) -> list:
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
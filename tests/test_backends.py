@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+import worker_node as wn
+from helpers import drain, make_limb, serve
+
+
+def test_parse_backend_specs():
+    specs = wn._parse_backend_specs("ollama=http://a:1#2, openai=http://b/v1/#4,,http://c")
+    assert specs == [
+        ("ollama", "http://a:1", 2),
+        ("openai", "http://b/v1", 4),
+        ("ollama", "http://c", wn.BACKEND_DEFAULT_PARALLEL),
+    ]
+
+
+def test_inference_backend_is_abstract():
+    with pytest.raises(TypeError):
+        wn.InferenceBackend("http://x", 1)
+
+
+def test_openai_backend_sends_server_model_ids():
+    backend = wn.OpenAIBackend("http://127.0.0.1:8080/v1", 2)
+    backend.available = ["meta-llama/Llama-3-8B", "qwen:7b"]
+    registry = wn.ModelRegistry("llama3")
+    registry.update(backend.available, [])
+    model = registry.resolve("meta-llama/Llama-3-8B")
+    assert backend.serves(model)
+    _, body = backend.generate_request({"model": model, "prompt": "p", "stream": False, "options": {}})
+    assert body["model"] == "meta-llama/Llama-3-8B"
+    assert backend.generate_request({"model": "qwen:7b", "prompt": "p", "stream": False})[1]["model"] == "qwen:7b"
+    assert backend.embed_request(model, ["x"])[1]["model"] == "meta-llama/Llama-3-8B"
+
+
+def test_openai_generation_end_to_end():
+    seen = []
+
+    async def models(request):
+        return web.json_response({"data": [{"id": "meta-llama/Llama-3-8B"}]})
+
+    async def chat(request):
+        body = await request.json()
+        seen.append(("chat", body["model"], body["messages"]))
+        if body["stream"]:
+            resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resp.prepare(request)
+            for event in ({"choices": [{"delta": {"role": "assistant"}}]},
+                          {"choices": [{"delta": {"content": "o"}}]},
+                          {"choices": [{"delta": {"content": "k"}}]},
+                          {"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 2}}):
+                await resp.write(f"data: {json.dumps(event)}\n\n".encode())
+            await resp.write(b"data: [DONE]\n\n")
+            return resp
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": "ok"}}],
+                                  "usage": {"prompt_tokens": 3, "completion_tokens": 1}})
+
+    async def completions(request):
+        body = await request.json()
+        seen.append(("completions", body["model"], body["prompt"]))
+        return web.json_response({"choices": [{"text": " done"}], "usage": {"prompt_tokens": 3, "completion_tokens": 1}})
+
+    async def scenario():
+        runner, url = await serve([("GET", "/v1/models", models), ("POST", "/v1/chat/completions", chat),
+                                   ("POST", "/v1/completions", completions)])
+        limb = make_limb(backends=[f"openai={url}#2"])
+        try:
+            await limb._refresh_model_inventory()
+            job = {"prompt": "p", "model": "meta-llama/Llama-3-8B", "cache": False}
+            return [
+                await limb.execute_task({**job, "job_id": "plain"}),
+                await limb.execute_task({**job, "job_id": "streamed", "stream": True}),
+                await limb.execute_task({**job, "job_id": "prefixed", "prefix": "SYSTEM. "}),
+            ], drain(limb.outbox)
+        finally:
+            await limb.close()
+            await runner.cleanup()
+
+    (plain, streamed, prefixed), frames = asyncio.run(scenario())
+    # Templated jobs use the chat endpoint, like Ollama's /api/generate; prefix jobs stay raw
+    assert plain["result"] == "ok"
+    assert "".join(f["delta"] for f in frames if f["last_event"] == "JOB_CHUNK") == "ok"
+    assert streamed["stats"]["eval_count"] == 2
+    assert prefixed["result"] == " done"
+    assert seen == [
+        ("chat", "meta-llama/Llama-3-8B", [{"role": "user", "content": "p"}]),
+        ("chat", "meta-llama/Llama-3-8B", [{"role": "user", "content": "p"}]),
+        ("completions", "meta-llama/Llama-3-8B", "SYSTEM. p"),
+    ]
@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+import bench_limb
+
+
+class FakeSocket:
+    """Async-iterable stand-in for the limb side of the dispatcher websocket."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.sent = []
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield json.dumps(frame)
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+def test_handshake_and_receipts_are_not_heartbeats():
+    frames = [
+        {"type": "handshake", "model": "x", "status": "online"},
+        {"type": "handshake", "challenge_resp": "abc", "node_id": "n"},
+        {"node_id": "n", "status": "IDLE", "slots": {"max": 1}},
+        {"node_id": "n", "status": "BUSY", "slots": {"max": 1}, "ack": "bench-0"},
+        {"type": "hb", "seq": 2, "d": {}},
+    ]
+
+    async def scenario():
+        dispatcher = bench_limb.MockDispatcher(jobs=1, rate=1, stream=False, prompt_chars=1)
+        await dispatcher._reader(FakeSocket(frames), expected="abc")
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert len(dispatcher.heartbeats) == 2
+    assert dispatcher.authenticated
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import worker_node as wn
+from helpers import make_limb
+
+
+@pytest.mark.parametrize("job, error", [
+    ({"type": "batch_generate", "prompts": ["a"], "concurrency": "x"}, "ERR: INVALID CONCURRENCY"),
+    ({"type": "batch_generate", "prompts": ["a", 3]}, "STRING PROMPTS"),
+    ({"type": "batch_generate", "prompts": ["a"], "prefix": 7}, "ERR: INVALID PREFIX"),
+    ({"type": "batch_generate", "prompts": ["a"], "num_predict": "lots"}, "ERR: INVALID GENERATION OPTIONS"),
+    ({"type": "embed", "input": ["a"], "batch_size": "x"}, "ERR: INVALID BATCH_SIZE"),
+    ({"type": "embed", "input": [{"text": "a"}]}, "STRING INPUTS"),
+])
+def test_bulk_jobs_validate_input_up_front(job, error):
+    async def scenario():
+        limb = make_limb()
+        return limb, await limb.execute_task({"job_id": "j1", **job})
+
+    limb, result = asyncio.run(scenario())
+    assert error in result["result"]
+    assert limb.active_jobs == {}
+
+
+def test_embed_jobs_warm_on_their_own_budget(monkeypatch):
+    monkeypatch.setattr(wn, "WARM_MAX_MODELS", 1)
+    monkeypatch.setattr(wn, "WARM_MAX_EMBED_MODELS", 1)
+
+    async def scenario():
+        limb = make_limb()
+        limb.models.update(["llama3:latest", "mxbai-large:latest"], ["llama3:latest"])
+
+        async def on_backend(model, call):
+            limb.models.mark_loaded(model)
+            return [[0.5, 0.25]]
+
+        limb._on_backend = on_backend
+        result = await limb.execute_task({"job_id": "e1", "type": "embed", "input": "hello", "model": "mxbai-large"})
+        for i in range(5):  # embed-heavy traffic
+            await limb.execute_task({"job_id": f"e{i + 2}", "type": "embed", "input": "hi", "model": "mxbai-large"})
+        entry = {"load_time": 1.0, "loaded_at": wn.datetime.now()}
+        limb.warm_models = {"llama3:latest": dict(entry), "mxbai-large:latest": dict(entry)}
+        targets = limb._warm_targets()
+        return limb, result, targets, limb._eviction_candidates(targets), limb.models.resolve()
+
+    limb, result, targets, evict, routed = asyncio.run(scenario())
+    assert result["count"] == 1 and result["result"] is None
+    assert "mxbai-large:latest" in limb.models.embed_models
+    assert list(limb.recent_models) == []
+    assert targets == ["llama3:latest", "mxbai-large:latest"]
+    assert evict == []  # neither budget evicts the other
+    assert routed == "llama3:latest"
+
+
+def test_bulk_jobs_time_out_on_idle_time_not_runtime():
+    async def scenario():
+        limb = make_limb()
+        progress = []
+
+        async def generate(payload, job_id, item, prefix=""):
+            progress.append(limb.active_jobs["b1"].get("progress_at"))
+            item["result"] = "ok"
+            return True
+
+        limb._generate = generate
+        result = await limb.execute_task({"job_id": "b1", "type": "batch_generate", "prompts": ["a", "b", "c"],
+                                          "concurrency": 1, "cache": False})
+
+        now = datetime.now()
+        long_ago, recently = now - timedelta(seconds=1000), now - timedelta(seconds=10)
+        limb.active_jobs = {
+            "bulk": {"start_time": long_ago, "container_id": None, "progress_at": recently},
+            "stuck": {"start_time": long_ago, "container_id": None},
+        }
+        return result, progress, [job_id for job_id, _, _ in limb._stale_jobs(now)]
+
+    result, progress, stale = asyncio.run(scenario())
+    assert result["count"] == 3
+    assert progress[0] is None and all(progress[1:])  # each finished item moves the deadline
+    assert stale == ["stuck"]
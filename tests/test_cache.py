@@ -0,0 +1,60 @@
+import asyncio
+
+from aiohttp import web
+
+import worker_node as wn
+from helpers import make_limb, serve
+
+
+def test_ttl_cache_lru_and_expiry():
+    cache = wn.TTLCache(2, 60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2}
+
+    expired = wn.TTLCache(2, -1)
+    expired.put("a", 1)
+    assert expired.get("a") is None
+    assert expired.stats()["size"] == 0
+
+
+
+def test_result_cache_key_ignores_ctx_and_batch():
+    base = {"temperature": 0.7, "num_predict": 64, "num_ctx": 2048}
+    throttled = {**base, "num_ctx": 8192, "num_batch": 256}
+    assert wn._result_cache_key("m", "", "p", base) == wn._result_cache_key("m", "", "p", throttled)
+    assert wn._result_cache_key("m", "", "p", base) != wn._result_cache_key("m", "", "p", {**base, "num_predict": 65})
+    assert wn._result_cache_key("m", "", "p", base) != wn._result_cache_key("m", "x", "p", base)
+
+
+def test_prefix_jobs_send_raw_prefix_plus_prompt_once():
+    posted = []
+
+    async def generate(request):
+        body = await request.json()
+        posted.append(body)
+        reply = {"response": "answer", "done": True}
+        if not body.get("raw"):
+            reply["context"] = [1, 2, 3]  # Ollama only returns context for templated requests
+        return web.json_response(reply)
+
+    async def scenario():
+        runner, url = await serve([("POST", "/api/generate", generate)])
+        limb = make_limb(backends=[f"ollama={url}#1"])
+        try:
+            return [await limb.execute_task({"job_id": f"j{i}", "prefix": "SYSTEM. ", "prompt": "Q", "cache": False})
+                    for i in range(2)]
+        finally:
+            await limb.close()
+            await runner.cleanup()
+
+    results = asyncio.run(scenario())
+    assert [r["result"] for r in results] == ["answer", "answer"]
+    assert len(posted) == 2  # no separate prefill round trip
+    for body in posted:
+        assert body["raw"] is True and body["prompt"] == "SYSTEM. Q"
+        assert "context" not in body
@@ -0,0 +1,20 @@
+import worker_node as wn
+
+
+def test_context_planner_sticks_to_resident_size_and_grows():
+    planner = wn.ContextPlanner()
+    assert planner.plan("m", 1000, loaded=False) == 2048
+    planner.loaded_with("m", 8192)
+    assert planner.plan("m", 3000, loaded=True) == 8192  # fits: no reload
+    assert planner.plan("m", 10000, loaded=True) == 16384  # grows
+    assert planner.plan("m", 100, loaded=False) == 16384  # cold load sized for the recent mix
+    assert wn.ContextPlanner.tier_for(10 ** 9) == wn.NUM_CTX_TIERS[-1]
+
+
+def test_context_planner_calibrates_chars_per_token():
+    planner = wn.ContextPlanner()
+    planner.observe("m", 100, 50)  # too short to trust
+    assert planner.estimate_tokens("m", 400) == 101
+    planner.observe("m", 1000, 500)
+    assert planner.chars_per_token["m"] == 2.0
+    assert planner.estimate_tokens("m", 400) == 201
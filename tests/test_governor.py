@@ -0,0 +1,42 @@
+import asyncio
+
+import worker_node as wn
+from helpers import make_limb
+
+
+def test_thermal_governor_steps_and_cooldown():
+    gov = wn.ThermalGovernor(4)
+    hot = wn.MAX_SAFE_TEMP_C - wn.GOVERNOR_SOFT_MARGIN_C + 3
+    assert gov.update(hot, 0, False, now=100) is True
+    assert (gov.allowed, gov.batch_scale) == (3, 0.5)
+    # Rate limited: no second step inside GOVERNOR_STEP_INTERVAL
+    assert gov.update(hot, 0, False, now=100 + wn.GOVERNOR_STEP_INTERVAL / 2) is False
+    assert gov.allowed == 3
+    # Cooldown is immediate and admits nothing
+    assert gov.update(wn.MAX_SAFE_TEMP_C + 5, 0, True, now=101 + wn.GOVERNOR_STEP_INTERVAL / 2) is True
+    assert gov.allowed == 0 and gov.cooldown
+    # Leaving cooldown steps back up without waiting out the interval
+    assert gov.update(40, 0, False, now=102 + wn.GOVERNOR_STEP_INTERVAL / 2) is True
+    assert gov.allowed == 1 and not gov.cooldown
+
+
+def test_power_budget_throttles(monkeypatch):
+    monkeypatch.setattr(wn, "GOVERNOR_POWER_BUDGET_W", 30)
+    gov = wn.ThermalGovernor(2)
+    assert gov.update(40, 45, False, now=0) is True
+    assert gov.allowed == 1 and gov.throttled
+    assert gov.update(40, 45, False, now=wn.GOVERNOR_STEP_INTERVAL) is False  # never below one slot
+
+
+def test_throttling_keeps_the_resident_context_size():
+    async def scenario():
+        limb = make_limb(max_concurrency=2)
+        limb.models.update(["m:latest"], ["m:latest"])
+        limb.ctx_planner.loaded_with("m:latest", 8192)
+        cool = limb._context_options({}, "m:latest", 400)
+        limb.governor.update(wn.MAX_SAFE_TEMP_C, 0, False, now=0)
+        return cool, limb._context_options({}, "m:latest", 400)
+
+    cool, throttled = asyncio.run(scenario())
+    assert cool["num_ctx"] == throttled["num_ctx"] == 8192  # a changed num_ctx would reload the model
+    assert throttled["num_batch"] == wn.DEFAULT_NUM_BATCH // 2
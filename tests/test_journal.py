@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import threading
+
+import worker_node as wn
+from helpers import drain, make_limb
+
+
+def test_job_journal_replay_and_compaction(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal" / "jobs.jsonl")
+    journal = wn.JobJournal(path)
+    for job_id in ("a", "b", "c"):
+        journal.accepted(job_id)
+    journal.completed({"job_id": "a", "result": "A"})
+    journal.completed({"job_id": "b", "result": "B"})
+    journal.acked("b")
+    journal.close()
+
+    # Restart: unacked results survive, interrupted and acked jobs are compacted away
+    journal = wn.JobJournal(path)
+    assert journal.undelivered() == [{"job_id": "a", "result": "A"}]
+    assert journal.pending == {}
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r["ev"], r["job_id"]) for r in records] == [("complete", "a")]
+
+    # Compaction on growth keeps only live entries
+    monkeypatch.setattr(wn, "JOURNAL_COMPACT_BYTES", 1)
+    journal.acked("a")
+    journal.close()
+    assert os.path.getsize(path) == 0
+
+
+def test_job_journal_expires_old_results(tmp_path, monkeypatch):
+    journal = wn.JobJournal(str(tmp_path / "jobs.jsonl"))
+    journal.completed({"job_id": "a", "result": "A"})
+    monkeypatch.setattr(wn, "JOURNAL_RETENTION", -1)
+    assert journal.undelivered() == []
+    journal.close()
+
+
+def test_journal_waits_for_negotiated_acks(tmp_path):
+    async def scenario():
+        limb = make_limb()
+        limb.journal = wn.JobJournal(str(tmp_path / "jobs.jsonl"))
+        limb._journal_result({"job_id": "legacy", "result": "x"})
+        assert not limb.journal.unacked
+
+        ack = limb._apply_protocol({"acks": True})
+        assert ack["acks"] is True and limb.dispatcher_acks
+        limb._journal_result({"job_id": "a", "result": "x"})
+        limb._journal_result({"job_id": "s", "result": None, "streamed": True})
+        assert list(limb.journal.unacked) == ["a"]
+
+        # A dispatcher without acks gets the backlog once, then the journal forgets it
+        limb._apply_protocol({"acks": False})
+        await limb._replay_journal()
+        replayed = drain(limb.outbox)
+        await limb._replay_journal()
+        return replayed, drain(limb.outbox), limb
+
+    replayed, again, limb = asyncio.run(scenario())
+    assert [(f["job_id"], f["replay"]) for f in replayed] == [("a", True)]
+    assert again == []
+    assert not limb.journal.unacked
+    limb.journal.close()
+
+
+def test_journal_writes_happen_off_the_calling_thread(tmp_path, monkeypatch):
+    writers = []
+    monkeypatch.setattr(wn, "JOURNAL_FSYNC", True)
+    monkeypatch.setattr(wn.os, "fsync", lambda fd: writers.append(threading.current_thread().name))
+
+    journal = wn.JobJournal(str(tmp_path / "jobs.jsonl"))
+    result = {"job_id": "a", "result": "A"}
+    journal.completed(result)
+    result["replay"] = True  # later changes to the payload are not journaled
+    assert list(journal.unacked) == ["a"]  # the in-memory view is current at once
+    journal.close()
+
+    assert writers and set(writers) == {"titan-journal"}
+    with open(tmp_path / "jobs.jsonl") as f:
+        assert json.loads(f.read())["result"] == {"job_id": "a", "result": "A"}
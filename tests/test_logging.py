@@ -0,0 +1,46 @@
+import io
+import json
+import logging
+import queue
+
+import worker_node as wn
+
+
+def _record(name, level=logging.INFO, msg="tick"):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+
+def test_sampling_filter_keeps_one_in_n_and_all_warnings():
+    sampler = wn.SamplingFilter("HEARTBEAT=3, JANITOR")
+    kept = [sampler.filter(_record("LIMB.HEARTBEAT")) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampler.filter(_record("LIMB.HEARTBEAT", logging.WARNING))
+    assert all(sampler.filter(_record("LIMB.JANITOR")) for _ in range(3))
+    assert all(sampler.filter(_record("LIMB")) for _ in range(3))
+
+
+def test_log_writer_drains_in_batches_and_stops(monkeypatch):
+    monkeypatch.setattr(wn, "LOG_BATCH_SIZE", 2)
+    flushes = []
+
+    class Handler(wn._BatchStreamHandler):
+        def flush_batch(self):
+            flushes.append(self.stream.getvalue().count("\n"))
+
+    stream = io.StringIO()
+    handler = Handler(stream)
+    handler.setFormatter(wn.JsonLineFormatter())
+    records = queue.SimpleQueue()
+    for i in range(3):
+        records.put(_record("LIMB", msg=f"m{i}"))
+
+    writer = wn.LogWriter(records, [handler])
+    writer.start()
+    writer.stop()
+    assert not writer.is_alive()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [entry["msg"] for entry in lines] == ["m0", "m1", "m2"]
+    assert lines[0]["logger"] == "LIMB" and lines[0]["level"] == "INFO"
+    # One flush per batch, not per record
+    assert flushes[:2] == [2, 3]
@@ -0,0 +1,34 @@
+import pytest
+
+import worker_node as wn
+
+
+def test_histogram_quantile():
+    hist = wn.Histogram((1, 2, 5))
+    assert hist.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 4):
+        hist.observe(value)
+    assert hist.quantile(0.5) == pytest.approx(1.5)
+    assert hist.quantile(1.0) == pytest.approx(5)
+    hist.observe(100)  # +Inf bucket is reported as the top bound
+    assert hist.quantile(1.0) == 5
+
+
+def test_render_prometheus_exposition():
+    metrics = wn.MetricsRegistry(prefix="t")
+    metrics.observe("ttft_seconds", 0.01)
+    metrics.observe("ttft_seconds", 1000)
+    metrics.inc("jobs_total", 3)
+    lines = metrics.render_prometheus().splitlines()
+
+    assert "# TYPE t_ttft_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("t_ttft_seconds_bucket")]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)  # cumulative
+    assert buckets[-1] == 't_ttft_seconds_bucket{le="+Inf"} 2'
+    assert counts[-2] == 1  # the 1000s observation only lands in +Inf
+    assert "t_ttft_seconds_count 2" in lines
+    assert "t_ttft_seconds_sum 1000.01" in lines
+    assert "# TYPE t_jobs_total counter" in lines and "t_jobs_total 3" in lines
+    assert "t_reconnects_total 0" in lines
+    assert metrics.summary() == {"ttft_s": pytest.approx(0.01, abs=0.01), "jobs": 3}
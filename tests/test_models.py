@@ -0,0 +1,27 @@
+import worker_node as wn
+
+
+def test_resolve_prefers_exact_then_family_warm_before_cold():
+    registry = wn.ModelRegistry("llama3")
+    assert registry.resolve("qwen") == "qwen"  # inventory unknown: trust the caller
+    registry.update(["llama3:8b", "llama3:70b", "qwen:7b"], ["llama3:70b"])
+    assert registry.resolve("qwen:7b") == "qwen:7b"
+    assert registry.resolve("qwen") == "qwen:7b"
+    assert registry.resolve("llama3:13b") == "llama3:70b"
+
+
+def test_default_never_falls_back_to_embed_or_foreign_warm_models():
+    registry = wn.ModelRegistry("llama3")
+    registry.update(["llama3:latest", "nomic-embed-text:latest"], ["nomic-embed-text:latest"])
+    assert registry.resolve() == "llama3:latest"
+
+    # A cold default beats another tenant's warm model
+    registry.update(["llama3:latest", "mistral:latest"], ["mistral:latest"])
+    assert registry.resolve(None) == "llama3:latest"
+
+    # Without the default family, only models that can generate qualify
+    registry.update(["all-minilm:latest", "mistral:latest"], ["all-minilm:latest"])
+    registry.embed_models.add("all-minilm:latest")
+    assert registry.resolve() == "mistral:latest"
+    registry.update(["all-minilm:latest"], ["all-minilm:latest"])
+    assert registry.resolve() == "llama3:latest"
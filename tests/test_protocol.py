@@ -0,0 +1,51 @@
+import pytest
+
+import worker_node as wn
+from helpers import make_limb
+
+
+def test_dict_delta():
+    previous = {"a": 1, "b": {"x": 1, "y": 2}, "c": 3}
+    current = {"a": 1, "b": {"x": 1, "y": 3}}
+    assert wn._dict_delta(previous, current) == {"b": {"y": 3}, "c": None}
+    assert wn._dict_delta(current, current) == {}
+
+
+def test_full_heartbeats_until_delta_is_negotiated():
+    limb = make_limb()
+    telemetry = {"node_id": "n", "status": "IDLE", "slots": {"active": 0}}
+    assert limb._heartbeat_frame(telemetry) is telemetry
+    assert limb._apply_protocol({"heartbeat": "bogus"})["heartbeat"] == "full"
+
+
+def test_delta_heartbeats_with_periodic_keyframes(monkeypatch):
+    monkeypatch.setattr(wn, "HEARTBEAT_KEYFRAME_EVERY", 3)
+    limb = make_limb()
+    limb._apply_protocol({"heartbeat": "delta"})
+
+    def beat(active):
+        return limb._heartbeat_frame({"node_id": "n", "wallet_address": "w", "hardware": "h",
+                                      "status": "IDLE", "slots": {"active": active, "max": 2}})
+
+    first = beat(0)
+    assert first == {"type": "hb", "seq": 1, "kf": True, "d": {"status": "IDLE", "slots": {"active": 0, "max": 2}}}
+    assert beat(0) == {"type": "hb", "seq": 2, "d": {}}
+    assert beat(1) == {"type": "hb", "seq": 3, "kf": True, "d": {"status": "IDLE", "slots": {"active": 1, "max": 2}}}
+    assert beat(2) == {"type": "hb", "seq": 4, "d": {"slots": {"active": 2}}}
+
+    # Renegotiating forces a keyframe; a reconnect returns to legacy full frames
+    limb._apply_protocol({"heartbeat": "delta"})
+    assert beat(2)["kf"] is True
+    limb._reset_protocol()
+    assert "type" not in beat(2)
+
+
+@pytest.mark.skipif(wn.msgpack is None, reason="msgpack not installed")
+def test_msgpack_encoding_round_trips():
+    limb = make_limb()
+    assert limb._apply_protocol({"encoding": "msgpack"})["encoding"] == "msgpack"
+    frame = {"type": "hb", "seq": 1, "d": {"slots": {"active": 1}}}
+    raw = limb._encode(frame)
+    assert isinstance(raw, bytes)
+    assert limb._decode(raw) == frame
+    assert limb._decode(b"\xc1") is None  # garbage is dropped, never raised
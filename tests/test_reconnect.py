@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+import worker_node as wn
+from helpers import FakeSocket, make_limb
+
+
+def test_reconnect_backoff_grows_within_bounds_and_resets(monkeypatch):
+    monkeypatch.setattr(wn, "RECONNECT_BASE_DELAY", 1.0)
+    monkeypatch.setattr(wn, "RECONNECT_MAX_DELAY", 10.0)
+    monkeypatch.setattr(wn, "RECONNECT_STABLE_AFTER", 30.0)
+
+    async def scenario():
+        limb = make_limb()
+        delays = []
+        previous = limb.reconnect_delay
+        for _ in range(20):
+            delay = limb._next_reconnect_delay(None)
+            assert 1.0 <= delay <= min(10.0, previous * 3)
+            delays.append(delay)
+            previous = delay
+        limb.reconnect_delay = 10.0
+        stable_since = asyncio.get_running_loop().time() - 31
+        return delays, limb._next_reconnect_delay(stable_since)
+
+    delays, after_stable_link = asyncio.run(scenario())
+    assert len(set(delays)) > 1  # jittered, not lockstep
+    assert after_stable_link <= 3.0
+
+
+def test_resume_token_expires(monkeypatch):
+    monkeypatch.setattr(wn, "RESUME_MAX_TTL", 60.0)
+
+    async def scenario():
+        limb = make_limb()
+        assert limb._resume_token() is None
+        limb._store_resume({"resume_token": "tok", "ttl": 3600})
+        ttl = limb.resume["expires"] - asyncio.get_running_loop().time()
+        token = limb._resume_token()
+        limb.resume["expires"] = asyncio.get_running_loop().time() - 1
+        return ttl, token, limb._resume_token(), limb.resume
+
+    ttl, token, expired, stored = asyncio.run(scenario())
+    assert ttl <= 60.0  # the dispatcher cannot extend past the local cap
+    assert token == "tok"
+    assert expired is None and stored is None
+
+
+def test_malformed_resume_ttl_is_ignored_without_killing_the_receive_loop():
+    async def scenario():
+        limb = make_limb()
+        stored = []
+        for ttl in ("soon", [5], float("nan"), -1):
+            limb._store_resume({"resume_token": "tok", "ttl": ttl})
+            stored.append(limb.resume)
+        ws = FakeSocket([{"type": "session", "resume_token": "tok", "ttl": "soon"},
+                         {"type": "session", "resume_token": "tok2", "ttl": 30}])
+        with pytest.raises(EOFError):  # only the fake link running dry ends the loop
+            await limb._receive_loop(ws)
+        return stored, limb._resume_token()
+
+    stored, token = asyncio.run(scenario())
+    assert stored == [None] * 4
+    assert token == "tok2"
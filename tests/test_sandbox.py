@@ -0,0 +1,11 @@
+import worker_node as wn
+
+
+def test_sandbox_commands_get_a_thread_per_slot():
+    pool = wn.SandboxPool(client=None, size=0, max_jobs=5)
+    try:
+        assert pool.exec_executor._max_workers == 5
+        assert pool.executor is not pool.exec_executor
+    finally:
+        pool.executor.shutdown(wait=False)
+        pool.exec_executor.shutdown(wait=False)
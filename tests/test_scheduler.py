@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import worker_node as wn
+from helpers import FakeSocket, drain, make_limb
+
+
+def test_crashed_job_reports_critical_result(tmp_path):
+    async def scenario():
+        limb = make_limb()
+        limb.journal = wn.JobJournal(str(tmp_path / "jobs.jsonl"))
+        limb.dispatcher_acks = True
+
+        async def crash(job):
+            limb.active_jobs[job["job_id"]] = {"start_time": wn.datetime.now(), "container_id": None}
+            raise RuntimeError("boom")
+
+        limb.execute_task = crash
+        job = {"job_id": "j1", "prompt": "p"}
+        limb.job_queue.put_nowait((0, 0, job))
+        limb.job_queue.get_nowait()
+        await limb._run_job(job)
+        return limb, drain(limb.outbox)
+
+    limb, frames = asyncio.run(scenario())
+    assert len(frames) == 1
+    assert frames[0]["last_event"] == "JOB_COMPLETE"
+    assert frames[0]["result"] == "CRITICAL: boom"
+    assert limb.active_jobs == {}
+    assert "j1" in limb.journal.unacked
+    limb.journal.close()
+
+
+def test_job_priority_validation():
+    assert wn.TitanLimb._job_priority({}) == 0
+    assert wn.TitanLimb._job_priority({"priority": "3"}) == 3
+    assert wn.TitanLimb._job_priority({"priority": "high"}) is None
+    assert wn.TitanLimb._job_priority({"priority": float("inf")}) is None
+    assert wn.TitanLimb._job_priority({"priority": [1]}) is None
+
+
+def test_receive_loop_rejects_bad_priority_and_keeps_reading():
+    async def scenario():
+        limb = make_limb()
+        ws = FakeSocket([{"job_id": "bad", "prompt": "p", "priority": "high"}, {"job_id": "ok", "prompt": "p"}])
+        with pytest.raises(EOFError):  # only the fake link running dry ends the loop
+            await limb._receive_loop(ws)
+        return limb, drain(limb.outbox)
+
+    limb, frames = asyncio.run(scenario())
+    rejected = [f for f in frames if f.get("last_event") == "JOB_REJECTED"]
+    assert [(f["job_id"], f["reason"]) for f in rejected] == [("bad", "INVALID_PRIORITY")]
+    assert limb.job_queue.qsize() == 1
+
+
+@pytest.mark.parametrize("job, preempted", [
+    ({"job_id": "low", "prompt": "p"}, True),
+    ({"job_id": "low", "prompt": "p", "stream": True}, False),
+    ({"job_id": "low", "type": "batch_generate", "prompts": ["p"]}, False),
+])
+def test_preemption_skips_streaming_jobs(job, preempted):
+    async def scenario():
+        limb = make_limb(max_concurrency=1)
+        task = asyncio.create_task(asyncio.sleep(10))
+        limb.job_tasks["low"] = task
+        limb._running["low"] = (0, 0, job)
+        limb._preempt_for(5)
+        await asyncio.sleep(0)
+        cancelled = task.cancelled()
+        task.cancel()
+        return cancelled, limb._cancel_reasons.get("low")
+
+    cancelled, reason = asyncio.run(scenario())
+    assert cancelled is preempted
+    assert reason == ("PREEMPTED" if preempted else None)
@@ -0,0 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+
+LIMB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core", "limb")
+
+PROBE = """
+import json, sys
+import worker_node
+print(json.dumps({
+    "network": sorted(m for m in ("aiohttp", "websockets", "docker") if m in sys.modules),
+    "handlers": len(__import__("logging").getLogger().handlers),
+}))
+"""
+
+
+def test_import_has_no_side_effects(tmp_path):
+    env = {**os.environ, "HOME": str(tmp_path), "PYTHONPATH": LIMB_DIR}
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, cwd=str(tmp_path),
+                         capture_output=True, text=True, timeout=60, check=True)
+    probe = json.loads(out.stdout.strip().splitlines()[-1])
+    assert probe == {"network": [], "handlers": 0}
+    assert os.listdir(tmp_path) == []  # no log, journal or profile directories
@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+import worker_node as wn
+from helpers import drain, make_limb, serve
+
+
+def test_stream_relay_coalesces_tokens_into_ordered_chunks(monkeypatch):
+    monkeypatch.setattr(wn, "STREAM_CHUNK_CHARS", 8)
+    monkeypatch.setattr(wn, "STREAM_FLUSH_INTERVAL", 60)
+
+    async def generate(request):
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        for _ in range(20):
+            await resp.write((json.dumps({"response": "ab", "done": False}) + "\n").encode())
+        await resp.write((json.dumps({"response": "", "done": True, "eval_count": 20}) + "\n").encode())
+        await resp.write_eof()
+        return resp
+
+    async def scenario():
+        runner, url = await serve([("POST", "/api/generate", generate)])
+        limb = make_limb(backends=[f"ollama={url}#1"])
+        try:
+            result = await limb.execute_task({"job_id": "s1", "prompt": "p", "stream": True})
+            return result, drain(limb.outbox)
+        finally:
+            await limb.close()
+            await runner.cleanup()
+
+    result, frames = asyncio.run(scenario())
+    chunks = [f for f in frames if f["last_event"] == "JOB_CHUNK"]
+    assert [c["seq"] for c in chunks] == list(range(len(chunks)))
+    assert "".join(c["delta"] for c in chunks) == "ab" * 20
+    assert chunks[0]["delta"] == "ab"  # first token leaves immediately
+    assert all(len(c["delta"]) >= 8 for c in chunks[1:-1])
+    assert result["streamed"] is True and result["chunks"] == len(chunks)
+    assert result["result"] is None and result["stats"]["eval_count"] == 20
@@ -0,0 +1,31 @@
+import os
+
+import worker_node as wn
+from helpers import make_limb
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_linux_sensors_ignore_non_gpu_zones(tmp_path):
+    sysfs = str(tmp_path)
+    _write(os.path.join(sysfs, "class/thermal/thermal_zone0/type"), "x86_pkg_temp\n")
+    _write(os.path.join(sysfs, "class/thermal/thermal_zone0/temp"), "95000\n")
+    _write(os.path.join(sysfs, "class/thermal/thermal_zone1/type"), "acpitz\n")
+    assert wn._discover_linux_sensors(sysfs)[0] == []
+
+    _write(os.path.join(sysfs, "class/hwmon/hwmon0/name"), "amdgpu\n")
+    _write(os.path.join(sysfs, "class/hwmon/hwmon0/temp1_input"), "61000\n")
+    _write(os.path.join(sysfs, "class/thermal/thermal_zone2/type"), "gpu-thermal\n")
+    temps, _ = wn._discover_linux_sensors(sysfs)
+    assert temps == [os.path.join(sysfs, "class/thermal/thermal_zone2/temp"),
+                     os.path.join(sysfs, "class/hwmon/hwmon0/temp1_input")]
+
+
+def test_no_gpu_sensor_reports_unknown_temperature():
+    limb = make_limb()
+    limb._linux_sensors = ([], [])
+    assert limb._read_linux_sensors()["gpu_temp"] == 0
@@ -0,0 +1,18 @@
+import asyncio
+
+import worker_node as wn
+from helpers import make_limb
+
+
+def test_eviction_spares_foreign_running_and_queued_models():
+    async def scenario():
+        limb = make_limb()
+        models = ["a:latest", "b:latest", "c:latest", "d:latest", "other:latest"]
+        limb.models.update(models, models)
+        entry = {"load_time": 1.0, "loaded_at": wn.datetime.now()}
+        limb.warm_models = {m: dict(entry) for m in models[:4]}  # "other" belongs to someone else
+        limb.active_jobs["run"] = {"start_time": wn.datetime.now(), "container_id": None, "model": "c:latest"}
+        limb.job_queue.put_nowait((0, 0, {"job_id": "q", "prompt": "p", "model": "b"}))
+        return limb._eviction_candidates(["d:latest"])
+
+    assert asyncio.run(scenario()) == ["a:latest"]